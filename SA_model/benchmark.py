@@ -0,0 +1,721 @@
+"""
+Latency, throughput and accuracy benchmark for the sentiment analyzers.
+
+Usage:
+    python benchmark.py --targets lexicon --output bench.json
+    python benchmark.py --targets lexicon,http --url http://localhost:8000/analyze-entry
+    python benchmark.py --targets lexicon --baseline benchmark_baseline.json
+
+Results are written as JSON so that a run can be compared against a stored baseline;
+the process exits with status 1 when a regression beyond the tolerance is found.
+"""
+import os
+import io
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import tempfile
+import platform
+import resource
+import importlib.util
+import multiprocessing
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Callable, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+CORPUS_SEED = 42
+DEFAULT_CONCURRENCIES = [1, 2, 4, 8]
+DEFAULT_TOLERANCE = 0.2  # Allow 20% drift before flagging a regression
+DEFAULT_EDITS = 5  # Edits replayed per entry in the edit-heavy workload
+VECTOR_QUERIES = 200
+VECTOR_USERS = 20
+SERIALIZATION_BATCH_SIZES = [1, 10, 100, 1000]
+OVERLOAD_SERVICE_MS = 80  # Simulated heavy analyzer service time
+OVERLOAD_SLO_MS = 500
+
+# Sentence pool the corpus is sampled from; covers every emotion in the lexicon plus neutral filler
+JOURNAL_SENTENCES = [
+    "Today I felt really happy and excited about the new project at work.",
+    "I am so grateful for my friends who showed up when I needed them.",
+    "The morning was quiet and I drank my coffee on the balcony.",
+    "I was disappointed that the meeting got cancelled again.",
+    "My sister called and we talked for almost an hour.",
+    "I'm worried about the exam next week and I can't sleep well.",
+    "Honestly I was furious when the landlord ignored my messages.",
+    "I finally finished the painting and I feel proud of it.",
+    "It rained all day so I stayed inside and read a book.",
+    "I feel guilty for snapping at my mother during dinner.",
+    "The surprise party was amazing, I was completely shocked.",
+    "Work was frustrating because nothing I tried seemed to fix the bug.",
+    "I went for a long walk in the park and noticed the trees changing colour.",
+    "Sometimes I feel jealous of how easy things seem for other people.",
+    "I miss my grandfather and today the grief came back suddenly.",
+    "We cooked pasta together and laughed about old stories.",
+    "I am nervous about the interview but also thrilled to have the chance.",
+    "Nothing special happened today, just errands and laundry.",
+    "I feel blessed to have a job that lets me help people.",
+    "The traffic made me late and I was annoyed for the rest of the morning.",
+]
+
+# Slots for synthesized sentences, so entries are varied instead of repeating the pool above
+SYNTHETIC_OPENERS = ["This morning", "After lunch", "Tonight", "On the way home", "During the meeting",
+                     "Before bed", "At the gym", "While cooking dinner", "Over the weekend", "Earlier today"]
+SYNTHETIC_SUBJECTS = ["my manager", "my brother", "an old friend", "the neighbours", "my therapist",
+                      "my partner", "a stranger on the bus", "the new intern", "my landlord", "my best friend"]
+SYNTHETIC_FEELINGS = ["happy", "grateful", "worried", "furious", "disappointed", "proud", "nervous",
+                      "jealous", "ashamed", "amazed", "calm", "tired", "bored", "relieved", "lonely"]
+SYNTHETIC_EVENTS = ["the deadline", "the test results", "a long phone call", "the rent increase",
+                    "the job offer", "a missed train", "the doctor's appointment", "the birthday plans",
+                    "a broken laptop", "the garden", "the budget spreadsheet", "a surprise visit"]
+SYNTHETIC_TEMPLATES = [
+    "{opener} I felt {feeling} about {event}.",
+    "{opener} {subject} told me about {event} and I was {feeling}.",
+    "I keep thinking about {event}; honestly I am {feeling}.",
+    "{opener} I talked with {subject} for {minutes} minutes and felt {feeling} afterwards.",
+    "It is strange to be {feeling} about {event} after {days} days.",
+]
+SYNTHETIC_RATIO = 0.7  # Share of sentences synthesized rather than drawn from JOURNAL_SENTENCES
+
+# Entry sizes in sentences: (name, min, max)
+ENTRY_SIZES = [("short", 1, 2), ("typical", 4, 10), ("long", 60, 120)]
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in re.split(r"(?<=[.!?])\s+", text.strip()) if sentence]
+
+
+def synthesize_sentence(rng: random.Random) -> str:
+    return rng.choice(SYNTHETIC_TEMPLATES).format(
+        opener=rng.choice(SYNTHETIC_OPENERS),
+        subject=rng.choice(SYNTHETIC_SUBJECTS),
+        feeling=rng.choice(SYNTHETIC_FEELINGS),
+        event=rng.choice(SYNTHETIC_EVENTS),
+        minutes=rng.randint(5, 120),
+        days=rng.randint(2, 60)
+    )
+
+
+def load_sample_texts(path: str) -> List[str]:
+    """Journal texts to sample from: JSON lines with a 'text' field, or one entry per line."""
+    texts = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line).get("text", "")
+            if line:
+                texts.append(line)
+    return texts
+
+
+def build_corpus(entries_per_size: int = 20, image_ratio: float = 0.25,
+                 seed: int = CORPUS_SEED, sample_texts: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Build a fixed corpus of journal entries.
+    Each entry is a dict with id, size, sentences, text and an optional RGB image array.
+    Sentences are mostly synthesized from templates and partly drawn from JOURNAL_SENTENCES;
+    when `sample_texts` are given, half of each size bucket is sampled from them instead.
+    The same seed and inputs always yield the same corpus so runs stay comparable.
+    """
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    samples = [split_sentences(text) for text in sample_texts or []]
+    corpus = []
+    for size, low, high in ENTRY_SIZES:
+        fitting = [sentences for sentences in samples if low <= len(sentences) <= high]
+        for i in range(entries_per_size):
+            if fitting and i % 2 == 0:
+                sentences = list(rng.choice(fitting))
+            else:
+                sentences = [
+                    synthesize_sentence(rng) if rng.random() < SYNTHETIC_RATIO else rng.choice(JOURNAL_SENTENCES)
+                    for _ in range(rng.randint(low, high))
+                ]
+            image = None
+            if rng.random() < image_ratio:
+                image = np_rng.integers(0, 256, size=(224, 224, 3), dtype=np.uint8)
+            corpus.append({
+                "id": f"{size}-{i}",
+                "size": size,
+                "sentences": sentences,
+                "text": " ".join(sentences),
+                "image": image
+            })
+    return corpus
+
+
+def normalize_label(result: Dict[str, Any]) -> str:
+    """Map the output of any analyzer to positive / neutral / negative."""
+    label = result.get("sentiment_label") or result.get("sentiment") or "neutral"
+    label = label.lower()
+    if "positive" in label:
+        return "positive"
+    if "negative" in label:
+        return "negative"
+    return "neutral"
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def summarize_latencies(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean_ms": float(np.mean(values)) if values else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99)
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def reset_target(analyze: Callable) -> None:
+    """Drop any result caches of a target so a timed pass starts cold."""
+    reset = getattr(analyze, "reset", None)
+    if reset is not None:
+        reset()
+
+
+def load_lexicon_target() -> Callable:
+    from sentiment_analysis_copy import analyze_sentiment, clear_sentence_cache, whole_text_scores
+
+    def analyze(text: str, image: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        return analyze_sentiment(text, image)
+
+    analyze.reset = clear_sentence_cache
+    analyze.previous_scores = whole_text_scores
+    return analyze
+
+
+def load_ensemble_target() -> Callable:
+    """
+    Load the ensemble analyzer from 'sentiment_analysis copy.py'.
+    Importing it loads the transformer models and the trained ensemble, so it is only loaded on request;
+    train the ensemble first by running that script.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sentiment_analysis copy.py")
+    spec = importlib.util.spec_from_file_location("sentiment_analysis_ensemble", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    def analyze(text: str, image: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        # Pass encoded bytes as the API does, so the CLIP feature cache sees the same keys
+        return module.analyze_sentiment(text, encode_png(image) if image is not None else None)
+
+    return analyze
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def encode_multipart(fields: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Encode form fields (str values or (filename, bytes, content_type) tuples) as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f"--{boundary}\r\n".encode())
+        if isinstance(value, tuple):
+            filename, data, content_type = value
+            body.write(f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'.encode())
+            body.write(f"Content-Type: {content_type}\r\n\r\n".encode())
+            body.write(data)
+        else:
+            body.write(f'Content-Disposition: form-data; name="{name}"\r\n\r\n'.encode())
+            body.write(str(value).encode())
+        body.write(b"\r\n")
+    body.write(f"--{boundary}--\r\n".encode())
+    return body.getvalue(), f"multipart/form-data; boundary={boundary}"
+
+
+def load_http_target(url: str, timeout: float = 30.0) -> Callable:
+    def analyze(text: str, image: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        fields = {"text": text}
+        if image is not None:
+            fields["image"] = ("image.png", encode_png(image), "image/png")
+        body, content_type = encode_multipart(fields)
+        request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+
+    analyze.remote = True
+    return analyze
+
+
+def measure_latency(analyze: Callable, corpus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Run the corpus sequentially and report latency percentiles overall and per entry size."""
+    latencies: Dict[str, List[float]] = {}
+    labels = {}
+    reset_target(analyze)
+    for entry in corpus:
+        start = time.perf_counter()
+        result = analyze(entry["text"], entry["image"])
+        elapsed = (time.perf_counter() - start) * 1000
+        latencies.setdefault(entry["size"], []).append(elapsed)
+        labels[entry["id"]] = normalize_label(result)
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "overall": summarize_latencies(all_latencies),
+        "by_size": {size: summarize_latencies(values) for size, values in latencies.items()},
+        "labels": labels
+    }
+
+
+def measure_throughput(analyze: Callable, corpus: List[Dict[str, Any]],
+                       concurrencies: List[int]) -> Dict[str, float]:
+    """Entries per second when the corpus is submitted from N concurrent workers."""
+    throughput = {}
+    for workers in concurrencies:
+        reset_target(analyze)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda entry: analyze(entry["text"], entry["image"]), corpus))
+        elapsed = time.perf_counter() - start
+        throughput[str(workers)] = len(corpus) / elapsed if elapsed > 0 else 0.0
+    return throughput
+
+
+def measure_edit_workload(analyze: Callable, corpus: List[Dict[str, Any]],
+                          edits: int = DEFAULT_EDITS, seed: int = CORPUS_SEED) -> Dict[str, Any]:
+    """
+    Replay an edit-heavy workload: every multi-sentence entry is analyzed once from cold
+    caches, then re-analyzed after each of `edits` successive single-sentence edits.
+    Reports the latency of the re-analyses next to the cold initial analyses.
+    """
+    rng = random.Random(seed)
+    initial, edited = [], []
+    for entry in corpus:
+        sentences = list(entry["sentences"])
+        if len(sentences) < 2:
+            continue
+        reset_target(analyze)
+        start = time.perf_counter()
+        analyze(entry["text"], entry["image"])
+        initial.append((time.perf_counter() - start) * 1000)
+        for n in range(edits):
+            index = rng.randrange(len(sentences))
+            # Tag each edited sentence with the entry and edit so no edit can be served from a cache
+            sentences[index] = synthesize_sentence(rng).rstrip(".") + f" (entry {entry['id']}, edit {n + 1})."
+            start = time.perf_counter()
+            analyze(" ".join(sentences), entry["image"])
+            edited.append((time.perf_counter() - start) * 1000)
+    return {
+        "edits_per_entry": edits,
+        "initial": summarize_latencies(initial),
+        "edited": summarize_latencies(edited)
+    }
+
+
+def measure_scoring_drift(analyze: Callable, corpus: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Agreement of a target with its previous scoring, for targets that expose one as
+    `analyze.previous_scores` (the lexicon target: whole-text VADER).
+    """
+    previous = getattr(analyze, "previous_scores", None)
+    if previous is None:
+        return None
+    same_label, same_polarity, deltas = 0, 0, []
+    for entry in corpus:
+        current, before = analyze(entry["text"], entry["image"]), previous(entry["text"])
+        same_label += current["sentiment_label"] == before["sentiment_label"]
+        same_polarity += normalize_label(current) == normalize_label(before)
+        deltas.append(abs(current["sentiment_score"] - before["sentiment_score"]))
+    return {
+        "label_agreement": same_label / len(corpus),
+        "polarity_agreement": same_polarity / len(corpus),
+        "mean_abs_score_delta": float(np.mean(deltas)),
+        "max_abs_score_delta": float(np.max(deltas))
+    }
+
+
+def measure_vector_index(size: int, k: int = 10, queries: int = VECTOR_QUERIES,
+                         users: int = VECTOR_USERS, seed: int = CORPUS_SEED) -> Dict[str, Any]:
+    """
+    Recall@k and latency of the similar-entries index against brute force, on clustered
+    synthetic 384-d vectors standing in for MiniLM embeddings. Entries are spread over
+    `users` users with a skewed (Zipf-like) distribution and queries are scoped to one
+    user, as /similar-entries issues them; unscoped IVF search is reported alongside.
+    """
+    from vector_store import VectorStore, EMBEDDING_DIM
+
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(max(8, size // 200), EMBEDDING_DIM))
+    vectors = topics[rng.integers(len(topics), size=size)] + 0.6 * rng.normal(size=(size, EMBEDDING_DIM))
+    weights = 1 / np.arange(1, users + 1)
+    owners = rng.choice(users, size=size, p=weights / weights.sum())
+    sources = rng.integers(size, size=queries)
+    probes = vectors[sources] + 0.2 * rng.normal(size=(queries, EMBEDDING_DIM))
+
+    def recall(exact, approximate):
+        truth = {r["entry_id"] for r in exact}
+        return len(truth & {r["entry_id"] for r in approximate}) / max(len(truth), 1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = VectorStore(directory)
+        start = time.perf_counter()
+        for i, vector in enumerate(vectors):
+            store.add(f"user-{owners[i]}", str(i), vector)
+        build_s = time.perf_counter() - start
+        store.wait_for_training()
+
+        latencies = {"ann": [], "exact": [], "unscoped_ann": []}
+        recalls = {"scoped": [], "unscoped": []}
+        for source, query in zip(sources, probes):
+            user_id = f"user-{owners[source]}"
+            start = time.perf_counter()
+            approximate = store.search(query, k=k, user_id=user_id)
+            latencies["ann"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            exact = store.search_exact(query, k=k, user_id=user_id)
+            latencies["exact"].append((time.perf_counter() - start) * 1000)
+            recalls["scoped"].append(recall(exact, approximate))
+
+            start = time.perf_counter()
+            approximate = store.search(query, k=k)
+            latencies["unscoped_ann"].append((time.perf_counter() - start) * 1000)
+            recalls["unscoped"].append(recall(store.search_exact(query, k=k), approximate))
+
+    return {
+        "size": size,
+        "users": users,
+        "k": k,
+        "build_s": build_s,
+        "recall_at_k": float(np.mean(recalls["scoped"])),
+        "ann": summarize_latencies(latencies["ann"]),
+        "exact": summarize_latencies(latencies["exact"]),
+        "unscoped": {
+            "recall_at_k": float(np.mean(recalls["unscoped"])),
+            "ann": summarize_latencies(latencies["unscoped_ann"])
+        }
+    }
+
+
+def sample_result(rng: random.Random) -> Dict[str, Any]:
+    """An analysis result shaped like sentiment_analysis_copy.analyze_sentiment output."""
+    from sentiment_analysis_copy import EMOTION_KEYWORDS
+
+    score = rng.uniform(-1, 1)
+    return {
+        "sentiment_score": score,
+        "sentiment_label": "Positive" if score > 0 else "Negative",
+        "magnitude": abs(score),
+        "confidence": rng.random(),
+        "probabilities": {"positive": rng.random(), "neutral": rng.random(), "negative": rng.random()},
+        "primary_emotion": "joy",
+        "secondary_emotions": ["gratitude", "pride"],
+        "emotion_scores": {emotion: rng.random() for emotion in EMOTION_KEYWORDS},
+        "key_phrases": ["project", "friends", "coffee", "meeting", "painting"]
+    }
+
+
+def measure_serialization(batch_sizes: List[int] = SERIALIZATION_BATCH_SIZES,
+                          repeats: int = 50, seed: int = CORPUS_SEED) -> Dict[str, Any]:
+    """Encoded size and median encode time of result batches for each available encoder."""
+    import response_encoding as encoding
+
+    encoders = {"json": encoding.stdlib_dumps}
+    if encoding.orjson is not None:
+        encoders["orjson"] = encoding.orjson.dumps
+    if encoding.msgpack is not None:
+        encoders["msgpack"] = lambda content: encoding.msgpack.packb(content, use_bin_type=True)
+    variants = {
+        "full": lambda result: result,
+        "emotion_array": encoding.compact_emotions,
+        "projected": lambda result: encoding.project(result, "sentiment_score,sentiment_label,primary_emotion")
+    }
+
+    rng = random.Random(seed)
+    report: Dict[str, Any] = {}
+    for batch_size in batch_sizes:
+        batch = [sample_result(rng) for _ in range(batch_size)]
+        for variant, transform in variants.items():
+            payload = [transform(result) for result in batch]
+            for name, dumps in encoders.items():
+                timings = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    encoded = dumps(payload)
+                    timings.append((time.perf_counter() - start) * 1e6)
+                report.setdefault(str(batch_size), {}).setdefault(variant, {})[name] = {
+                    "bytes": len(encoded),
+                    "encode_us": percentile(timings, 50)
+                }
+    return report
+
+
+def measure_overload(load: float = 2.0, duration: float = 10.0, workers: int = 2,
+                     slo_ms: float = OVERLOAD_SLO_MS, seed: int = CORPUS_SEED) -> Dict[str, Any]:
+    """
+    Load-test the overload controller with a simulated heavy analyzer.
+    Requests arrive as a Poisson process at `load` times the heavy path's capacity, once
+    with shedding disabled (infinite SLO) and once with `slo_ms`; reports the latency
+    percentiles and the fraction of degraded answers of each run.
+    """
+    from overload import OverloadController
+
+    service = OVERLOAD_SERVICE_MS / 1000
+
+    def heavy(text, image=None):
+        time.sleep(service)
+        return {"sentiment": "neutral"}
+
+    def cheap(text, image=None):
+        time.sleep(0.001)
+        return {"sentiment_label": "Neutral"}
+
+    def run(slo: float) -> Dict[str, Any]:
+        controller = OverloadController(heavy, cheap, slo_ms=slo, workers=workers)
+        rng = random.Random(seed)
+        rate = load * workers / service
+        latencies, degraded = [], []
+
+        def request(i):
+            start = time.perf_counter()
+            result = controller.analyze(f"request-{i}", f"entry {i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            degraded.append(result["degraded"])
+
+        with ThreadPoolExecutor(max_workers=256) as pool:
+            deadline = time.perf_counter() + duration
+            i = 0
+            while time.perf_counter() < deadline:
+                pool.submit(request, i)
+                i += 1
+                time.sleep(rng.expovariate(rate))
+        summary = {
+            "latency": summarize_latencies(latencies),
+            "degraded_fraction": sum(degraded) / len(degraded) if degraded else 0.0,
+            "controller": controller.snapshot()
+        }
+        controller.shutdown()
+        return summary
+
+    return {
+        "load": load,
+        "service_ms": OVERLOAD_SERVICE_MS,
+        "slo_ms": slo_ms,
+        "without_shedding": run(float("inf")),
+        "with_shedding": run(slo_ms)
+    }
+
+
+def label_agreement(labels: Dict[str, str], reference: Dict[str, str]) -> float:
+    shared = [key for key in labels if key in reference]
+    if not shared:
+        return 0.0
+    return sum(labels[key] == reference[key] for key in shared) / len(shared)
+
+
+def measure_target(analyze: Callable, corpus: List[Dict[str, Any]], concurrencies: List[int],
+                   edits: int = DEFAULT_EDITS) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """All measurements of one target; returns its results and its label per corpus entry."""
+    # Warm up caches and lazily loaded resources before timing
+    analyze(corpus[0]["text"], corpus[0]["image"])
+    latency = measure_latency(analyze, corpus)
+    labels = latency.pop("labels")
+    results = {
+        "latency": latency,
+        "throughput_per_s": measure_throughput(analyze, corpus, concurrencies)
+    }
+    if edits > 0:
+        results["edit_workload"] = measure_edit_workload(analyze, corpus, edits)
+    drift = measure_scoring_drift(analyze, corpus)
+    if drift is not None:
+        results["scoring_drift"] = drift
+    # The peak RSS of this process only describes targets that run in it, not a remote server
+    if not getattr(analyze, "remote", False):
+        results["peak_rss_mb"] = peak_rss_mb()
+    return results, labels
+
+
+def _target_process(loader: Callable[[], Callable], corpus: List[Dict[str, Any]],
+                    concurrencies: List[int], edits: int, connection) -> None:
+    try:
+        connection.send(("ok", measure_target(loader(), corpus, concurrencies, edits)))
+    except BaseException as e:
+        connection.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        connection.close()
+
+
+def run_isolated(loader: Callable[[], Callable], corpus: List[Dict[str, Any]], concurrencies: List[int],
+                 edits: int = DEFAULT_EDITS) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Load and measure a target in a forked child process, so its peak RSS is its own
+    rather than the high-water mark of every target measured before it.
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_target_process, args=(loader, corpus, concurrencies, edits, sender))
+    process.start()
+    sender.close()
+    try:
+        status, payload = receiver.recv()
+    except EOFError:
+        status, payload = "error", f"benchmark process exited with code {process.exitcode}"
+    process.join()
+    if status != "ok":
+        raise RuntimeError(payload)
+    return payload
+
+
+def run_benchmark(loaders: Dict[str, Callable[[], Callable]], corpus: List[Dict[str, Any]],
+                  concurrencies: List[int] = DEFAULT_CONCURRENCIES,
+                  reference: str = "lexicon", edits: int = DEFAULT_EDITS) -> Dict[str, Any]:
+    """Benchmark each target, given as a loader returning its analyze function, in its own process."""
+    results: Dict[str, Any] = {}
+    all_labels = {}
+    for name, loader in loaders.items():
+        results[name], all_labels[name] = run_isolated(loader, corpus, concurrencies, edits)
+
+    reference_labels = all_labels.get(reference)
+    for name, labels in all_labels.items():
+        if reference_labels is not None:
+            results[name]["label_agreement"] = label_agreement(labels, reference_labels)
+        results[name]["label_distribution"] = {
+            label: list(labels.values()).count(label) for label in ("positive", "neutral", "negative")
+        }
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus_seed": CORPUS_SEED,
+            "corpus_size": len(corpus),
+            "reference": reference
+        },
+        "results": results
+    }
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any],
+                        tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Return a list of human-readable regressions of `report` against `baseline`."""
+    regressions = []
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            old = previous["latency"]["overall"].get(key, 0.0)
+            new = current["latency"]["overall"].get(key, 0.0)
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append(f"{name}: latency {key} {old:.2f} -> {new:.2f}")
+        for workers, old in previous.get("throughput_per_s", {}).items():
+            new = current["throughput_per_s"].get(workers)
+            if new is not None and old > 0 and new < old * (1 - tolerance):
+                regressions.append(f"{name}: throughput at {workers} workers {old:.1f}/s -> {new:.1f}/s")
+        old_edit = previous.get("edit_workload", {}).get("edited", {}).get("p95_ms", 0.0)
+        new_edit = current.get("edit_workload", {}).get("edited", {}).get("p95_ms", 0.0)
+        if old_edit > 0 and new_edit > old_edit * (1 + tolerance):
+            regressions.append(f"{name}: edit workload p95_ms {old_edit:.2f} -> {new_edit:.2f}")
+        old_rss, new_rss = previous.get("peak_rss_mb", 0.0), current.get("peak_rss_mb", 0.0)
+        if old_rss > 0 and new_rss > old_rss * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {old_rss:.1f}MB -> {new_rss:.1f}MB")
+        old_agreement = previous.get("label_agreement")
+        new_agreement = current.get("label_agreement")
+        if old_agreement is not None and new_agreement is not None and new_agreement < old_agreement - 0.05:
+            regressions.append(f"{name}: label agreement {old_agreement:.3f} -> {new_agreement:.3f}")
+    previous_index = baseline.get("vector_index")
+    current_index = report.get("vector_index")
+    if (previous_index and current_index and previous_index["size"] == current_index["size"]
+            and previous_index.get("users") == current_index.get("users")):
+        if current_index["recall_at_k"] < previous_index["recall_at_k"] - 0.02:
+            regressions.append(f"vector_index: recall@k {previous_index['recall_at_k']:.3f} -> "
+                               f"{current_index['recall_at_k']:.3f}")
+        old, new = previous_index["ann"]["p95_ms"], current_index["ann"]["p95_ms"]
+        if old > 0 and new > old * (1 + tolerance):
+            regressions.append(f"vector_index: ann p95_ms {old:.2f} -> {new:.2f}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the sentiment analyzers")
+    parser.add_argument("--targets", default="lexicon",
+                        help="Comma-separated list of lexicon, ensemble, http")
+    parser.add_argument("--url", default="http://localhost:8000/analyze-entry",
+                        help="Endpoint used by the http target")
+    parser.add_argument("--entries-per-size", type=int, default=20)
+    parser.add_argument("--corpus-file",
+                        help="Journal texts (JSON lines with 'text', or one per line) to sample entries from")
+    parser.add_argument("--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCIES)))
+    parser.add_argument("--edits", type=int, default=DEFAULT_EDITS,
+                        help="Edits per entry in the edit-heavy workload (0 disables it)")
+    parser.add_argument("--vector-index", type=int, default=0,
+                        help="Also benchmark the similar-entries index with this many vectors")
+    parser.add_argument("--serialization", action="store_true",
+                        help="Also benchmark response encodings across payload sizes")
+    parser.add_argument("--overload", type=float, default=0.0,
+                        help="Also load-test the overload controller at this multiple of heavy capacity")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--baseline", help="Compare against a previously saved report")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    loaders = {
+        "lexicon": load_lexicon_target,
+        "ensemble": load_ensemble_target,
+        "http": lambda: load_http_target(args.url)
+    }
+    targets = {}
+    for name in args.targets.split(","):
+        name = name.strip()
+        if name not in loaders:
+            parser.error(f"Unknown target '{name}'")
+        targets[name] = loaders[name]
+
+    sample_texts = load_sample_texts(args.corpus_file) if args.corpus_file else None
+    corpus = build_corpus(entries_per_size=args.entries_per_size, sample_texts=sample_texts)
+    concurrencies = [int(c) for c in args.concurrency.split(",")]
+    report = run_benchmark(targets, corpus, concurrencies, edits=args.edits)
+    report["meta"]["corpus_file"] = args.corpus_file
+    if args.vector_index > 0:
+        report["vector_index"] = measure_vector_index(args.vector_index)
+    if args.serialization:
+        report["serialization"] = measure_serialization()
+    if args.overload > 0:
+        report["overload"] = measure_overload(load=args.overload)
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import threading
+from typing import Optional
+
+import numpy as np
+
+SENTENCE_MODEL_NAME = "all-MiniLM-L6-v2"
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def _get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            # sentence-transformers is heavy, so it is only imported when embeddings are needed
+            from sentence_transformers import SentenceTransformer
+            _model = SentenceTransformer(SENTENCE_MODEL_NAME)
+        return _model
+
+
+def use_model(model) -> None:
+    """Embed with an already loaded MiniLM, e.g. the heavy ensemble's, instead of loading a second copy."""
+    global _model
+    with _model_lock:
+        _model = model
+
+
+def embeddings_available() -> bool:
+    if _model is not None:
+        return True
+    try:
+        import sentence_transformers  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_sentence_embedding(text: str) -> Optional[np.ndarray]:
+    """Full 384-d MiniLM embedding of a text, or None when sentence-transformers is not installed."""
+    if not embeddings_available():
+        return None
+    return np.asarray(_get_model().encode(text), dtype=np.float32)
@@ -0,0 +1,236 @@
+"""
+Content-addressed cache of CLIP image embeddings.
+
+Images are keyed by a SHA-256 of their bytes, encoded in batches and stored as float16
+in SQLite, so analyzing the same media file again (or backfilling) never re-runs the
+CLIP vision tower. Backfill a folder of images with:
+    python image_features.py path/to/images [--batch-size 32]
+"""
+import io
+import os
+import sys
+import sqlite3
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Union, Dict, Tuple
+
+import numpy as np
+from PIL import Image
+
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+DEFAULT_CACHE_PATH = os.environ.get(
+    "IMAGE_FEATURE_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "image_features.sqlite3")
+)
+DEFAULT_BATCH_SIZE = 16
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif")
+
+ImageInput = Union[bytes, np.ndarray]
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_features (
+    content_hash TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    embedding BLOB NOT NULL
+);
+"""
+
+
+def content_hash(image: ImageInput) -> str:
+    """
+    SHA-256 of encoded image bytes, or of the shape and pixels of a decoded array.
+    The two never coincide, so callers that can should pass the bytes as uploaded:
+    that is what a backfill of the original files keys on.
+    """
+    digest = hashlib.sha256()
+    if isinstance(image, np.ndarray):
+        digest.update(str(image.shape).encode())
+        digest.update(np.ascontiguousarray(image).tobytes())
+    else:
+        digest.update(image)
+    return digest.hexdigest()
+
+
+def _to_pil(image: ImageInput) -> Image.Image:
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image).convert("RGB")
+    pil_image = Image.open(io.BytesIO(image))
+    # Decode at a reduced size when the format supports it; CLIP only needs 224x224
+    pil_image.draft("RGB", (448, 448))
+    return pil_image.convert("RGB")
+
+
+def _try_to_pil(item) -> Optional[Image.Image]:
+    key, image = item
+    try:
+        return _to_pil(image)
+    except Exception as e:
+        logger.warning(f"Skipping undecodable image {key[:12]}: {e}")
+        return None
+
+
+class ClipImageEncoder:
+    """Batched CLIP image encoder. Reuses an already loaded model when one is given."""
+
+    def __init__(self, model=None, processor=None, model_name: str = CLIP_MODEL_NAME):
+        self.model_name = model_name
+        self._model = model
+        self._processor = processor
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None or self._processor is None:
+                from transformers import CLIPModel, CLIPProcessor
+                self._model = CLIPModel.from_pretrained(self.model_name)
+                self._processor = CLIPProcessor.from_pretrained(self.model_name)
+                self._model.eval()
+        return self._model, self._processor
+
+    def encode(self, images: List[Image.Image]) -> np.ndarray:
+        """Unit-normalized image embeddings (the same as CLIPModel's image_embeds)."""
+        import torch
+
+        model, processor = self._load()
+        inputs = processor(images=images, return_tensors="pt")
+        with torch.no_grad():
+            features = model.get_image_features(**inputs)
+        features = features / features.norm(dim=-1, keepdim=True)
+        return features.cpu().numpy().astype(np.float32)
+
+
+class ImageFeatureCache:
+    """
+    Persistent, content-addressed store of CLIP image embeddings.
+    Lookups hit SQLite only; misses are decoded in parallel, encoded in batches and
+    written back as float16.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, encoder: Optional[ClipImageEncoder] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 4):
+        self.path = path
+        self.encoder = encoder or ClipImageEncoder()
+        self.batch_size = batch_size
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _lookup(self, hashes: List[str]) -> dict:
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for key, embedding in self._conn.execute(
+                        f"SELECT content_hash, embedding FROM image_features "
+                        f"WHERE model = ? AND content_hash IN ({placeholders})",
+                        [self.encoder.model_name] + chunk):
+                    found[key] = np.frombuffer(embedding, dtype=np.float16).astype(np.float32)
+        return found
+
+    def _store(self, hashes: List[str], embeddings: np.ndarray) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_features (content_hash, model, embedding) VALUES (?, ?, ?)",
+                [(key, self.encoder.model_name, embedding.astype(np.float16).tobytes())
+                 for key, embedding in zip(hashes, embeddings)]
+            )
+
+    def _encode(self, images: List[ImageInput]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """
+        Content hashes of the images and their cached or freshly encoded embeddings. Each image is decoded on its
+        own, so one that fails is logged and left out instead of failing its whole batch.
+        """
+        hashes = [content_hash(image) for image in images]
+        found = self._lookup(sorted(set(hashes)))
+
+        missing = {}
+        for key, image in zip(hashes, images):
+            if key not in found and key not in missing:
+                missing[key] = image
+        missing_keys = list(missing)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for start in range(0, len(missing_keys), self.batch_size):
+                batch_keys = missing_keys[start:start + self.batch_size]
+                decoded = list(pool.map(_try_to_pil, [(key, missing[key]) for key in batch_keys]))
+                batch_keys = [key for key, pil_image in zip(batch_keys, decoded) if pil_image is not None]
+                if not batch_keys:
+                    continue
+                embeddings = self.encoder.encode([pil_image for pil_image in decoded if pil_image is not None])
+                self._store(batch_keys, embeddings)
+                # Serve what was just stored, so cached and fresh results are identical
+                for key, embedding in zip(batch_keys, embeddings):
+                    found[key] = embedding.astype(np.float16).astype(np.float32)
+        return hashes, found
+
+    def features(self, images: List[ImageInput]) -> np.ndarray:
+        """
+        Embeddings for a list of images (encoded bytes or RGB arrays), in input order.
+        Raises ValueError if any image cannot be decoded; the others are still cached.
+        """
+        hashes, found = self._encode(images)
+        failed = sum(key not in found for key in hashes)
+        if failed:
+            raise ValueError(f"{failed} of {len(images)} images could not be decoded")
+        return np.stack([found[key] for key in hashes]) if hashes else np.zeros((0, 0), dtype=np.float32)
+
+    def backfill(self, images: List[ImageInput]) -> int:
+        """Cache the embeddings of every decodable image. Returns how many were skipped."""
+        hashes, found = self._encode(images)
+        return sum(key not in found for key in hashes)
+
+    def feature(self, image: ImageInput) -> np.ndarray:
+        return self.features([image])[0]
+
+    def __contains__(self, image: ImageInput) -> bool:
+        return content_hash(image) in self._lookup([content_hash(image)])
+
+
+def _find_images(paths: List[str]) -> List[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Precompute CLIP image features for a set of images")
+    parser.add_argument("paths", nargs="+", help="Image files or directories")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    cache = ImageFeatureCache(args.cache, batch_size=args.batch_size)
+    files = _find_images(args.paths)
+    # Read files in chunks so a large backfill does not hold every image in memory
+    chunk = args.batch_size * 8
+    skipped = 0
+    for start in range(0, len(files), chunk):
+        contents = []
+        for path in files[start:start + chunk]:
+            try:
+                with open(path, "rb") as f:
+                    contents.append(f.read())
+            except OSError as e:
+                logger.warning(f"Skipping unreadable file {path}: {e}")
+                skipped += 1
+        skipped += cache.backfill(contents)
+        print(f"Processed {min(start + chunk, len(files))}/{len(files)} images, {skipped} skipped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Optional, List
+
+DEFAULT_DB_PATH = os.environ.get(
+    "MOOD_ROLLUP_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "mood_rollups.sqlite3")
+)
+GRANULARITIES = ("day", "week", "month")
+MAX_TRACKED_PHRASES = 50  # Phrase counts kept per bucket; the returned top-k is drawn from these
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    user_id TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    entry_date TEXT NOT NULL,
+    analysis TEXT NOT NULL,
+    PRIMARY KEY (user_id, entry_id)
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    user_id TEXT NOT NULL,
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    entry_count INTEGER NOT NULL,
+    compound_sum REAL NOT NULL,
+    label_counts TEXT NOT NULL,
+    emotion_sums TEXT NOT NULL,
+    phrase_counts TEXT NOT NULL,
+    PRIMARY KEY (user_id, granularity, bucket)
+);
+"""
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """First day of the day / ISO week / month bucket containing `day`."""
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity '{granularity}'")
+
+
+def parse_date(value: Optional[str]) -> date:
+    """Parse an ISO date or datetime string; defaults to today (UTC)."""
+    if not value:
+        return datetime.utcnow().date()
+    value = value.strip().replace("Z", "+00:00")
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        return date.fromisoformat(value[:10])
+
+
+def _summary(result: Dict[str, Any], analysis_key: Optional[str] = None) -> Dict[str, Any]:
+    """The parts of an analysis result that contribute to the rollups, and which analysis it was."""
+    return {
+        "sentiment_score": float(result.get("sentiment_score", 0.0)),
+        "sentiment_label": result.get("sentiment_label", "Neutral"),
+        "emotion_scores": {k: float(v) for k, v in result.get("emotion_scores", {}).items()},
+        "key_phrases": list(result.get("key_phrases", [])),
+        "analysis_key": analysis_key,
+        "degraded": bool(result.get("degraded", False))
+    }
+
+
+def _add_counts(target: Dict[str, float], values: Dict[str, float], sign: int) -> None:
+    for key, value in values.items():
+        updated = target.get(key, 0) + sign * value
+        if updated > 1e-9:
+            target[key] = updated
+        else:
+            target.pop(key, None)
+
+
+class MoodRollupStore:
+    """
+    Per-user daily, weekly and monthly mood rollups kept in a local SQLite file.
+    Each analyzed entry is folded into its three buckets as it arrives; re-analyzing an
+    entry replaces its previous contribution. Reading a time range touches one row per
+    bucket, independent of how many entries the user has written.
+    """
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def record_entry(self, user_id: str, entry_id: str, result: Dict[str, Any],
+                     entry_date: Optional[str] = None, analysis_key: Optional[str] = None) -> bool:
+        """
+        Add (or replace) the contribution of one analyzed entry to the user's rollups.
+        A degraded result never replaces the full result of the same analysis, whichever
+        is written last. Returns False when the result was ignored for that reason.
+        """
+        summary = _summary(result, analysis_key)
+        day = parse_date(entry_date)
+        with self._lock, self._conn:
+            previous = self._conn.execute(
+                "SELECT entry_date, analysis FROM entries WHERE user_id = ? AND entry_id = ?",
+                (user_id, entry_id)
+            ).fetchone()
+            if previous is not None:
+                previous_summary = json.loads(previous[1])
+                if (summary["degraded"] and analysis_key is not None
+                        and previous_summary.get("analysis_key") == analysis_key
+                        and not previous_summary.get("degraded", False)):
+                    return False
+                self._apply(user_id, date.fromisoformat(previous[0]), previous_summary, -1)
+            self._apply(user_id, day, summary, 1)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (user_id, entry_id, entry_date, analysis) VALUES (?, ?, ?, ?)",
+                (user_id, entry_id, day.isoformat(), json.dumps(summary))
+            )
+        return True
+
+    def remove_entry(self, user_id: str, entry_id: str) -> bool:
+        """Remove a deleted entry from the rollups. Returns False if it was never recorded."""
+        with self._lock, self._conn:
+            previous = self._conn.execute(
+                "SELECT entry_date, analysis FROM entries WHERE user_id = ? AND entry_id = ?",
+                (user_id, entry_id)
+            ).fetchone()
+            if previous is None:
+                return False
+            self._apply(user_id, date.fromisoformat(previous[0]), json.loads(previous[1]), -1)
+            self._conn.execute("DELETE FROM entries WHERE user_id = ? AND entry_id = ?", (user_id, entry_id))
+        return True
+
+    def _apply(self, user_id: str, day: date, summary: Dict[str, Any], sign: int) -> None:
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(day, granularity).isoformat()
+            row = self._conn.execute(
+                "SELECT entry_count, compound_sum, label_counts, emotion_sums, phrase_counts "
+                "FROM rollups WHERE user_id = ? AND granularity = ? AND bucket = ?",
+                (user_id, granularity, bucket)
+            ).fetchone()
+            if row is None:
+                count, compound_sum, labels, emotions, phrases = 0, 0.0, {}, {}, {}
+            else:
+                count, compound_sum = row[0], row[1]
+                labels, emotions, phrases = json.loads(row[2]), json.loads(row[3]), json.loads(row[4])
+
+            count += sign
+            compound_sum += sign * summary["sentiment_score"]
+            _add_counts(labels, {summary["sentiment_label"]: 1}, sign)
+            _add_counts(emotions, summary["emotion_scores"], sign)
+            _add_counts(phrases, {phrase: 1 for phrase in summary["key_phrases"]}, sign)
+            if len(phrases) > MAX_TRACKED_PHRASES:
+                phrases = dict(sorted(phrases.items(), key=lambda x: (-x[1], x[0]))[:MAX_TRACKED_PHRASES])
+
+            if count <= 0:
+                self._conn.execute(
+                    "DELETE FROM rollups WHERE user_id = ? AND granularity = ? AND bucket = ?",
+                    (user_id, granularity, bucket)
+                )
+                continue
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rollups (user_id, granularity, bucket, entry_count, compound_sum, "
+                "label_counts, emotion_sums, phrase_counts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, granularity, bucket, count, compound_sum,
+                 json.dumps(labels), json.dumps(emotions), json.dumps(phrases))
+            )
+
+    def timeseries(self, user_id: str, granularity: str = "day", start: Optional[str] = None,
+                   end: Optional[str] = None, top_k: int = 5) -> List[Dict[str, Any]]:
+        """Return one aggregate per non-empty bucket between `start` and `end` (inclusive ISO dates)."""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        query = ("SELECT bucket, entry_count, compound_sum, label_counts, emotion_sums, phrase_counts "
+                 "FROM rollups WHERE user_id = ? AND granularity = ?")
+        params: List[Any] = [user_id, granularity]
+        if start:
+            query += " AND bucket >= ?"
+            params.append(bucket_start(parse_date(start), granularity).isoformat())
+        if end:
+            query += " AND bucket <= ?"
+            params.append(parse_date(end).isoformat())
+        query += " ORDER BY bucket"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        buckets = []
+        for bucket, count, compound_sum, labels, emotions, phrases in rows:
+            phrases = json.loads(phrases)
+            buckets.append({
+                "bucket": bucket,
+                "entry_count": count,
+                "mean_sentiment_score": compound_sum / count,
+                "label_counts": json.loads(labels),
+                "emotion_score_sums": json.loads(emotions),
+                "key_phrases": [p for p, _ in sorted(phrases.items(), key=lambda x: (-x[1], x[0]))[:top_k]]
+            })
+        return buckets
@@ -0,0 +1,264 @@
+import os
+import time
+import hashlib
+import threading
+import logging
+import importlib
+import importlib.util
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Callable
+
+import numpy as np
+
+DEFAULT_SLO_MS = float(os.environ.get("ANALYSIS_SLO_MS", "5000"))
+DEFAULT_WORKERS = int(os.environ.get("HEAVY_ANALYZER_WORKERS", "2"))
+RECOVER_RATIO = 0.7  # Leave degraded mode only once projected latency is below 70% of the SLO
+MIN_DEGRADED_SECONDS = 2.0  # ...and at least this long after entering it
+WINDOW = 50  # Recent requests used for the latency estimates
+SAMPLE_MAX_AGE = 30.0  # Seconds a latency sample counts towards the estimates
+MAX_PENDING_UPGRADES = 200
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "5000"))
+
+logger = logging.getLogger(__name__)
+
+
+def load_analyzer(spec: str) -> Callable:
+    """
+    Load an analyzer from 'module:function' or 'path/to/file.py:function'.
+    A file path is needed for the ensemble, whose module name contains a space; importing
+    it loads the models saved by a training run and never trains or launches the demo UI.
+    """
+    target, _, function = spec.rpartition(":")
+    if not target:
+        target, function = spec, "analyze_sentiment"
+    if target.endswith(".py"):
+        if not os.path.isabs(target):
+            target = os.path.join(os.path.dirname(os.path.abspath(__file__)), target)
+        module_spec = importlib.util.spec_from_file_location("heavy_analyzer", target)
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(target)
+    return getattr(module, function)
+
+
+def analysis_key(text: str, image_bytes: Optional[bytes] = None) -> str:
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16)
+    if image_bytes:
+        digest.update(hashlib.sha256(image_bytes).digest())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU of analysis results by analysis key."""
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            result = self._items.get(key)
+            if result is not None:
+                self._items.move_to_end(key)
+            return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._items[key] = result
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+
+class OverloadController:
+    """
+    Admission control for the heavy analyzer.
+    Heavy analyses run on a bounded worker pool. From the recent service times and the
+    number of analyses in the system the controller projects the latency a new request
+    would see; above the SLO it switches to degraded mode and answers with the cheap
+    analyzer instead, flagged `degraded`, while the full analysis is queued in the
+    background and replaces the cached result when done. Hysteresis (a lower exit
+    threshold and a minimum dwell time) keeps it from flapping at the boundary.
+    Background upgrades are timed like admitted requests, and samples older than
+    SAMPLE_MAX_AGE are dropped, so the estimate keeps moving while degraded.
+    """
+
+    def __init__(self, heavy: Callable, cheap: Callable, slo_ms: float = DEFAULT_SLO_MS,
+                 workers: int = DEFAULT_WORKERS, results: Optional[ResultCache] = None):
+        self.heavy = heavy
+        self.cheap = cheap
+        self.slo = slo_ms / 1000
+        self.workers = workers
+        self.results = results or ResultCache()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="heavy-analyzer")
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="heavy-upgrade")
+        self._lock = threading.Lock()
+        self._service_times = deque(maxlen=WINDOW)
+        self._queue_waits = deque(maxlen=WINDOW)
+        self._in_system = 0
+        self._pending_upgrades = set()
+        self.degraded = False
+        self._degraded_since = 0.0
+        self.metrics = {
+            "full_responses": 0,
+            "degraded_responses": 0,
+            "cache_hits": 0,
+            "upgrades_completed": 0,
+            "upgrades_dropped": 0,
+            "upgrades_failed": 0,
+            "heavy_failures": 0,
+            "degraded_transitions": 0
+        }
+
+    def _expire_samples(self, now: float) -> None:
+        # Called with the lock held; samples are (finished at, seconds) in arrival order
+        for samples in (self._service_times, self._queue_waits):
+            while samples and now - samples[0][0] > SAMPLE_MAX_AGE:
+                samples.popleft()
+
+    def projected_latency(self) -> float:
+        """
+        Seconds a request admitted now is expected to take on the heavy path: the p90
+        service time for every round of workers ahead of it, plus the p90 queue wait
+        recent requests saw beyond what that already accounts for.
+        """
+        with self._lock:
+            self._expire_samples(time.monotonic())
+            if not self._service_times:
+                return 0.0
+            service = float(np.percentile([seconds for _, seconds in self._service_times], 90))
+            queue_wait = float(np.percentile([seconds for _, seconds in self._queue_waits], 90)) \
+                if self._queue_waits else 0.0
+            rounds = self._in_system // self.workers
+            return service + max(service * rounds, queue_wait)
+
+    def _update_state(self) -> bool:
+        projected = self.projected_latency()
+        now = time.monotonic()
+        with self._lock:
+            if not self.degraded and projected > self.slo:
+                self.degraded = True
+                self._degraded_since = now
+                self.metrics["degraded_transitions"] += 1
+            elif (self.degraded and projected < self.slo * RECOVER_RATIO
+                  and now - self._degraded_since >= MIN_DEGRADED_SECONDS):
+                self.degraded = False
+            return self.degraded
+
+    def _full_analysis(self, text: str, image: Optional[bytes]) -> Dict[str, Any]:
+        # The lexicon fields are always present; the heavy analyzer adds to or refines them
+        result = dict(self.cheap(text, image))
+        result.update(self.heavy(text, image))
+        result["degraded"] = False
+        return result
+
+    def _timed(self, submitted: Optional[float], text: str, image: Optional[bytes]) -> Dict[str, Any]:
+        """Run the full analysis, recording its service time (and queue wait, if `submitted`)."""
+        started = time.monotonic()
+        try:
+            return self._full_analysis(text, image)
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                if submitted is not None:
+                    self._queue_waits.append((finished, started - submitted))
+                self._service_times.append((finished, finished - started))
+                self._in_system -= 1
+
+    def analyze(self, key: str, text: str, image: Optional[bytes] = None,
+                on_upgrade: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Return the full analysis, or the cheap one flagged degraded when the heavy path is saturated.
+        `image` is the encoded image as uploaded and is passed to both analyzers unchanged.
+        """
+        cached = self.results.get(key)
+        if cached is not None and not cached["degraded"]:
+            with self._lock:
+                self.metrics["cache_hits"] += 1
+            return cached
+
+        if self._update_state():
+            result = dict(self.cheap(text, image))
+            result["degraded"] = True
+            result["analysis_key"] = key
+            self.results.put(key, result)
+            self._schedule_upgrade(key, text, image, on_upgrade)
+            with self._lock:
+                self.metrics["degraded_responses"] += 1
+            return result
+
+        with self._lock:
+            self._in_system += 1
+        try:
+            result = self._pool.submit(self._timed, time.monotonic(), text, image).result()
+        except Exception:
+            # A failing heavy analyzer (e.g. an untrained ensemble) must not fail the request;
+            # answer with the cheap result, flagged degraded and not cached
+            logger.exception("Heavy analyzer failed; answering with the cheap analyzer")
+            result = dict(self.cheap(text, image))
+            result["degraded"] = True
+            result["analysis_key"] = key
+            with self._lock:
+                self.metrics["heavy_failures"] += 1
+            return result
+        self.results.put(key, result)
+        with self._lock:
+            self.metrics["full_responses"] += 1
+        return result
+
+    def _schedule_upgrade(self, key: str, text: str, image: Optional[bytes],
+                          on_upgrade: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        with self._lock:
+            if key in self._pending_upgrades:
+                return
+            if len(self._pending_upgrades) >= MAX_PENDING_UPGRADES:
+                self.metrics["upgrades_dropped"] += 1
+                return
+            self._pending_upgrades.add(key)
+
+        def upgrade():
+            with self._lock:
+                self._in_system += 1
+            try:
+                # Upgrades have their own queue, so only their service time is recorded
+                result = self._timed(None, text, image)
+                self.results.put(key, result)
+                if on_upgrade is not None:
+                    on_upgrade(result)
+                with self._lock:
+                    self.metrics["upgrades_completed"] += 1
+            except Exception:
+                logger.exception("Background upgrade of %s failed", key)
+                with self._lock:
+                    self.metrics["upgrades_failed"] += 1
+            finally:
+                with self._lock:
+                    self._pending_upgrades.discard(key)
+
+        self._background.submit(upgrade)
+
+    def snapshot(self) -> Dict[str, Any]:
+        projected = self.projected_latency()
+        with self._lock:
+            service_times = [seconds for _, seconds in self._service_times]
+            queue_waits = [seconds for _, seconds in self._queue_waits]
+            return {
+                "degraded": self.degraded,
+                "slo_ms": self.slo * 1000,
+                "projected_latency_ms": projected * 1000,
+                "in_system": self._in_system,
+                "workers": self.workers,
+                "pending_upgrades": len(self._pending_upgrades),
+                "service_time_p90_ms": float(np.percentile(service_times, 90)) * 1000
+                if service_times else 0.0,
+                "queue_wait_p90_ms": float(np.percentile(queue_waits, 90)) * 1000
+                if queue_waits else 0.0,
+                **self.metrics
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False)
+        self._background.shutdown(wait=False)
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional, List, Tuple
+
+# Default sampling settings
+DEFAULT_INTERVAL = 0.005  # seconds between samples
+DEFAULT_OUTPUT_DIR = os.environ.get(
+    "PROFILER_OUTPUT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+)
+MAX_DURATION = 300.0  # Never sample for more than five minutes per session
+
+# Leaf frames of threads that are blocked waiting rather than doing work:
+# event-loop selectors, idle pool workers, lock and condition waits
+IDLE_LEAF_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socket.py", "accept"),
+    ("socketserver.py", "serve_forever"),
+    ("_base.py", "result"),
+    ("_base.py", "wait"),
+}
+
+
+def _frame_label(frame) -> Tuple[str, str, int]:
+    code = frame.f_code
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAF_FRAMES
+
+
+def _walk_stack(frame) -> Tuple[Tuple[str, str, int], ...]:
+    """Return the stack of a frame, outermost call first."""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the running service.
+    A background thread periodically snapshots the stacks of the worker threads
+    with sys._current_frames(), so the service keeps serving traffic unmodified.
+    Sampling runs either for a fixed number of seconds or only while every Kth
+    request is in flight, and writes collapsed-stack and speedscope files.
+    """
+
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, interval: float = DEFAULT_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stacks: Counter = Counter()
+        self._idle_samples = 0
+        self._mode: Optional[str] = None
+        self._deadline: Optional[float] = None
+        self._every: int = 0
+        self._max_requests: int = 0
+        self._seen_requests = 0
+        self._sampled_requests = 0
+        self._active_threads: Dict[int, int] = {}
+        self._started_at: Optional[float] = None
+        self._last_output: Dict[str, Any] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: Optional[float] = None, every: Optional[int] = None,
+              max_requests: int = 50, interval: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Start a sampling session.
+        Exactly one of `duration` (seconds) or `every` (sample every Kth request) must be given.
+        """
+        if (duration is None) == (every is None):
+            raise ValueError("Specify exactly one of 'duration' or 'every'")
+        if duration is not None and not 0 < duration <= MAX_DURATION:
+            raise ValueError(f"'duration' must be between 0 and {MAX_DURATION} seconds")
+        if every is not None and (every < 1 or max_requests < 1):
+            raise ValueError("'every' and 'max_requests' must be positive")
+
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Profiler is already running")
+            if interval is not None:
+                self.interval = max(interval, 0.001)
+            self._stacks = Counter()
+            self._idle_samples = 0
+            self._stop_event.clear()
+            self._started_at = time.time()
+            self._seen_requests = 0
+            self._sampled_requests = 0
+            self._active_threads = {}
+            if duration is not None:
+                self._mode = "duration"
+                self._deadline = time.monotonic() + duration
+            else:
+                self._mode = "requests"
+                # Request mode is still bounded in time so a quiet service cannot leave it running
+                self._deadline = time.monotonic() + MAX_DURATION
+                self._every = every
+                self._max_requests = max_requests
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        """Stop the current session (if any) and return the written output files."""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "mode": self._mode,
+            "interval": self.interval,
+            "samples": sum(self._stacks.values()),
+            "idle_samples_dropped": self._idle_samples,
+            "requests_seen": self._seen_requests,
+            "requests_sampled": self._sampled_requests,
+            "last_output": self._last_output
+        }
+
+    def request_started(self) -> bool:
+        """
+        Called when a request begins. Returns True if this request is being sampled,
+        in which case request_finished() must be called when it completes.
+        """
+        if self._mode != "requests" or not self.running:
+            return False
+        with self._lock:
+            self._seen_requests += 1
+            if self._seen_requests % self._every != 0 or self._sampled_requests >= self._max_requests:
+                return False
+            self._sampled_requests += 1
+            ident = threading.get_ident()
+            self._active_threads[ident] = self._active_threads.get(ident, 0) + 1
+        return True
+
+    def request_finished(self) -> None:
+        with self._lock:
+            ident = threading.get_ident()
+            count = self._active_threads.get(ident, 0) - 1
+            if count > 0:
+                self._active_threads[ident] = count
+            else:
+                self._active_threads.pop(ident, None)
+            if self._sampled_requests >= self._max_requests and not self._active_threads:
+                self._stop_event.set()
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        try:
+            while not self._stop_event.is_set() and time.monotonic() < self._deadline:
+                self._sample(own_ident)
+                self._stop_event.wait(self.interval)
+        finally:
+            self._write_output()
+
+    def _sample(self, own_ident: int) -> None:
+        if self._mode == "requests":
+            with self._lock:
+                if not self._active_threads:
+                    return
+        # All threads are sampled, since a request may hand its work to a worker pool,
+        # but threads parked in an idle wait are dropped so the profile shows only work
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            if _is_idle(frame):
+                self._idle_samples += 1
+                continue
+            self._stacks[_walk_stack(frame)] += 1
+
+    def _write_output(self) -> None:
+        if not self._stacks:
+            self._last_output = {"samples": 0}
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        millis = int((self._started_at % 1) * 1000)
+        name = f"profile-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started_at))}-{millis:03d}-{os.getpid()}"
+        folded_path = os.path.join(self.output_dir, name + ".folded")
+        speedscope_path = os.path.join(self.output_dir, name + ".speedscope.json")
+
+        with open(folded_path, "w") as f:
+            f.write(to_collapsed(self._stacks))
+        with open(speedscope_path, "w") as f:
+            json.dump(to_speedscope(self._stacks, self.interval, name), f)
+
+        self._last_output = {
+            "samples": sum(self._stacks.values()),
+            "collapsed": folded_path,
+            "speedscope": speedscope_path
+        }
+
+
+def _format_frame(label: Tuple[str, str, int]) -> str:
+    name, filename, line = label
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """Render stack counts in Brendan Gregg's collapsed format (input for flamegraph.pl)."""
+    lines = [
+        ";".join(_format_frame(label) for label in stack) + f" {count}"
+        for stack, count in stacks.most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(stacks: Counter, interval: float, name: str) -> Dict[str, Any]:
+    """Render stack counts as a speedscope 'sampled' profile."""
+    frame_index: Dict[Tuple[str, str, int], int] = {}
+    frames: List[Dict[str, Any]] = []
+    samples: List[List[int]] = []
+    weights: List[float] = []
+    for stack, count in stacks.most_common():
+        indices = []
+        for label in stack:
+            if label not in frame_index:
+                frame_index[label] = len(frames)
+                frames.append({"name": label[0], "file": label[1], "line": label[2]})
+            indices.append(frame_index[label])
+        samples.append(indices)
+        weights.append(count * interval)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights
+        }],
+        "name": name,
+        "exporter": "sentiment_api profiler"
+    }
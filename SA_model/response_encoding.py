@@ -0,0 +1,150 @@
+import json
+from typing import Dict, Any, Optional, List, Tuple
+
+from fastapi.responses import Response, JSONResponse
+
+from sentiment_analysis_copy import EMOTION_KEYWORDS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Fixed order of the compact emotion score array; 'neutral' is used when no emotion words are found
+EMOTION_ORDER: List[str] = list(EMOTION_KEYWORDS) + ["neutral"]
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+EMOTION_FORMATS = ("map", "array")
+# Top-level keys a result can have: the lexicon analyzer's, the overload controller's
+# and those the ensemble adds when it is the heavy analyzer
+RESULT_FIELDS = (
+    "sentiment_score", "sentiment_label", "magnitude", "confidence", "probabilities",
+    "primary_emotion", "secondary_emotions", "emotion_scores", "key_phrases",
+    "degraded", "analysis_key", "sentiment", "roberta_sentiment"
+)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated `fields` parameter, rejecting keys no result can have."""
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in RESULT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def project(result: Dict[str, Any], fields: Optional[str]) -> Dict[str, Any]:
+    """
+    Keep only the comma-separated top-level `fields` of a result. Fields this result
+    does not have (e.g. heavy-analyzer fields of a degraded result) are left out.
+    """
+    requested = parse_fields(fields)
+    if requested is None:
+        return result
+    return {field: result[field] for field in requested if field in result}
+
+
+def compact_emotions(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the emotion_scores map with an array ordered as EMOTION_ORDER."""
+    scores = result.get("emotion_scores")
+    if not isinstance(scores, dict):
+        return result
+    compact = dict(result)
+    compact["emotion_scores"] = [float(scores.get(emotion, 0.0)) for emotion in EMOTION_ORDER]
+    return compact
+
+
+def parse_accept(accept: Optional[str]) -> List[Tuple[str, float]]:
+    """Media ranges of an Accept header with their q-values; a missing header accepts anything."""
+    if not accept:
+        return [("*/*", 1.0)]
+    ranges = []
+    for part in accept.split(","):
+        media_range, *params = [piece.strip() for piece in part.split(";")]
+        if not media_range:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((media_range.lower(), quality))
+    return ranges
+
+
+def _quality(media_type: str, ranges: List[Tuple[str, float]]) -> Tuple[float, int]:
+    """q-value of the most specific range matching `media_type`, with that range's specificity."""
+    main_type = media_type.split("/")[0]
+    best = (0.0, -1)
+    for media_range, quality in ranges:
+        if media_range == media_type:
+            specificity = 2
+        elif media_range == f"{main_type}/*":
+            specificity = 1
+        elif media_range == "*/*":
+            specificity = 0
+        else:
+            continue
+        if specificity > best[1]:
+            best = (quality, specificity)
+    return best
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """
+    Pick the response media type for an Accept header, or None when nothing we can
+    produce is acceptable. MessagePack wins over JSON only with a higher q-value, or an
+    equal one from a more specific range (e.g. "application/msgpack, */*").
+    """
+    ranges = parse_accept(accept)
+    candidates = [("application/json", _quality("application/json", ranges))]
+    if msgpack is not None:
+        candidates.append(max(((media_type, _quality(media_type, ranges)) for media_type in MSGPACK_MEDIA_TYPES),
+                              key=lambda x: x[1]))
+    media_type, (quality, _) = max(candidates, key=lambda x: x[1])
+    return media_type if quality > 0 else None
+
+
+def encode(content: Any, accept: Optional[str] = None) -> Response:
+    """
+    Serialize a response body according to the Accept header.
+    MessagePack when preferred and available, otherwise JSON, using orjson when installed.
+    The body depends on Accept, so caches are told to key on it.
+    """
+    headers = {"Vary": "Accept"}
+    media_type = negotiate(accept) or "application/json"
+    if media_type in MSGPACK_MEDIA_TYPES:
+        return Response(content=msgpack.packb(content, use_bin_type=True), media_type=media_type,
+                        headers=headers)
+    if orjson is not None:
+        return Response(content=orjson.dumps(content), media_type="application/json", headers=headers)
+    return JSONResponse(content=content, headers=headers)
+
+
+def encode_result(result: Dict[str, Any], accept: Optional[str] = None, fields: Optional[str] = None,
+                  emotions: str = "map") -> Response:
+    """Project, optionally compact and serialize an analysis result."""
+    if emotions not in EMOTION_FORMATS:
+        raise ValueError(f"emotions must be one of {', '.join(EMOTION_FORMATS)}")
+    content = project(result, fields)
+    headers = {}
+    if emotions == "array":
+        content = compact_emotions(content)
+        headers["X-Emotion-Order"] = ",".join(EMOTION_ORDER)
+    response = encode(content, accept)
+    response.headers.update(headers)
+    return response
+
+
+def stdlib_dumps(content: Any) -> bytes:
+    """The encoding JSONResponse uses; kept for benchmarking against the faster encoders."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
@@ -1,3 +1,5 @@
+import os
+import json
 import pandas as pd
 import numpy as np
 from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline, CLIPProcessor, CLIPModel
@@ -25,10 +27,10 @@ from xgboost import XGBClassifier
 from collections import Counter
 from sklearn.utils.class_weight import compute_class_weight
 import gc
-import gradio as gr
 from PIL import Image
 import cv2
 import joblib
+from image_features import ImageFeatureCache, ClipImageEncoder
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -60,9 +62,6 @@ download_nltk_data()
 logger.info("Loading spaCy model...")
 nlp = spacy.load('en_core_web_sm')
 
-# Load the dataset
-logger.info("Loading dataset...")
-df = pd.read_csv('Reviews.csv')
 
 # Initialize models
 logger.info("Loading models...")
@@ -247,197 +246,6 @@ def get_sentence_embeddings(text):
         logger.error(f"Error in getting sentence embeddings: {str(e)}")
         return np.zeros(384)
 
-# Sample a smaller subset of the data for testing
-sample_size = 300  # Further reduced from 500
-df_sample = df.sample(n=min(sample_size, len(df)), random_state=42)
-
-logger.info("Extracting features...")
-# Extract features
-df_sample['roberta_sentiment'] = df_sample['Text'].apply(get_roberta_sentiment)
-df_sample['emotions'] = df_sample['Text'].apply(get_emotions)
-df_sample['embeddings'] = df_sample['Text'].apply(get_sentence_embeddings)
-df_sample['emotion_features'] = df_sample['Text'].apply(get_emotion_features)
-
-# Prepare features for ensemble model with reduced dimensionality
-X = np.array([np.concatenate([
-    np.array([
-        features['exclamation_count'],
-        features['question_count'],
-        features['capital_count'],
-        features['word_count'],
-        features['avg_word_length'],
-        features['sentiment_polarity'],
-        features['sentiment_subjectivity'],
-        features['emotion_intensity'],
-        features['emotion_diversity']
-    ] + [features[f'emotion_{emotion}'] for emotion in EMOTION_KEYWORDS.keys()]),
-    embeddings[:32]  # Further reduced from 64
-]) for features, embeddings in zip(df_sample['emotion_features'], df_sample['embeddings'])])
-
-# Scale features
-scaler = StandardScaler()
-X = scaler.fit_transform(X)
-
-# Prepare labels with numeric encoding
-label_map = {'negative': 0, 'neutral': 1, 'positive': 2}
-label_map_reverse = {0: 'negative', 1: 'neutral', 2: 'positive'}
-y = df_sample['Score'].map({1: 'negative', 2: 'negative', 3: 'neutral', 4: 'positive', 5: 'positive'})
-y_numeric = y.map(label_map)
-
-# Calculate class weights to handle imbalance
-class_weights = compute_class_weight(
-    class_weight='balanced',
-    classes=np.unique(y_numeric),
-    y=y_numeric
-)
-class_weight_dict = dict(zip(np.unique(y_numeric), class_weights))
-
-# Split data
-X_train, X_test, y_train, y_test = train_test_split(X, y_numeric, test_size=0.2, random_state=42)
-
-# Enhanced hyperparameter tuning
-param_dist = {
-    'svc__C': [0.1, 1, 10, 100],
-    'svc__gamma': ['scale', 'auto', 0.1, 0.01],
-    'rf__n_estimators': [100, 200, 300],
-    'rf__max_depth': [10, 20, None],
-    'rf__min_samples_split': [2, 5, 10],
-    'rf__min_samples_leaf': [1, 2, 4],
-    'xgb__max_depth': [3, 5, 7],
-    'xgb__learning_rate': [0.01, 0.05, 0.1],
-    'xgb__n_estimators': [100, 200, 300],
-    'xgb__subsample': [0.8, 0.9, 1.0],
-    'xgb__colsample_bytree': [0.8, 0.9, 1.0],
-    'gb__n_estimators': [100, 200, 300],
-    'gb__learning_rate': [0.01, 0.05, 0.1],
-    'gb__max_depth': [3, 5, 7],
-    'gb__subsample': [0.8, 0.9, 1.0]
-}
-
-# Create base models with enhanced parameters and memory optimization
-base_models = [
-    ('svc', SVC(
-        probability=True,
-        kernel='rbf',
-        class_weight=class_weight_dict,
-        cache_size=2000,
-        max_iter=1000
-    )),
-    ('rf', RandomForestClassifier(
-        n_estimators=200,
-        max_depth=None,
-        min_samples_split=5,
-        min_samples_leaf=2,
-        n_jobs=1,
-        class_weight=class_weight_dict,
-        random_state=42
-    )),
-    ('xgb', XGBClassifier(
-        max_depth=5,
-        learning_rate=0.05,
-        n_estimators=200,
-        subsample=0.9,
-        colsample_bytree=0.9,
-        n_jobs=1,
-        random_state=42
-    )),
-    ('gb', GradientBoostingClassifier(
-        n_estimators=200,
-        learning_rate=0.05,
-        max_depth=5,
-        subsample=0.9,
-        random_state=42
-    ))
-]
-
-# Create ensemble with dynamic weights based on model performance
-ensemble = VotingClassifier(
-    estimators=base_models,
-    voting='soft',
-    weights=[1, 1, 1, 1],
-    n_jobs=1
-)
-
-# Use RandomizedSearchCV with enhanced memory optimization
-random_search = RandomizedSearchCV(
-    ensemble,
-    param_distributions=param_dist,
-    n_iter=50,  # Increased iterations for better optimization
-    cv=5,  # Increased cross-validation folds
-    scoring='accuracy',
-    n_jobs=1,
-    random_state=42,
-    verbose=1,
-    pre_dispatch='2*n_jobs',
-    error_score='raise'
-)
-
-# Memory optimization
-def optimize_memory():
-    """Optimize memory usage"""
-    gc.collect()
-    torch.cuda.empty_cache() if torch.cuda.is_available() else None
-    return True
-
-# Train model with memory optimization
-logger.info("Training ensemble model with memory optimization...")
-optimize_memory()
-random_search.fit(X_train, y_train)
-
-# Get best model and parameters
-best_ensemble = random_search.best_estimator_
-best_params = random_search.best_params_
-
-# Calculate model weights based on individual performance
-model_weights = []
-for name, model in base_models:
-    model.fit(X_train, y_train)
-    score = model.score(X_test, y_test)
-    model_weights.append(score)
-
-# Normalize weights
-model_weights = np.array(model_weights) / sum(model_weights)
-
-# Create final ensemble with optimized weights
-final_ensemble = VotingClassifier(
-    estimators=base_models,
-    voting='soft',
-    weights=model_weights,
-    n_jobs=1
-)
-
-# Train final ensemble
-logger.info("Training final ensemble with optimized weights...")
-optimize_memory()
-final_ensemble.fit(X_train, y_train)
-
-# Evaluate final model
-y_pred = final_ensemble.predict(X_test)
-accuracy = accuracy_score(y_test, y_pred)
-report = classification_report(y_test, y_pred)
-
-logger.info("\nFinal Model Performance:")
-logger.info(f"Best Parameters: {best_params}")
-logger.info(f"Model Weights: {dict(zip([name for name, _ in base_models], model_weights))}")
-logger.info(f"Ensemble Model Accuracy: {accuracy:.4f}")
-logger.info("\nClassification Report:")
-logger.info(report)
-
-# Save model and results
-joblib.dump(final_ensemble, 'sentiment_model.joblib')
-joblib.dump(scaler, 'feature_scaler.joblib')
-
-# Save detailed results
-results = pd.DataFrame({
-    'Text': df_sample['Text'].iloc[:len(y_pred)],  # Match the length of predictions
-    'Score': df_sample['Score'].iloc[:len(y_pred)],
-    'Predicted_Sentiment': [label_map_reverse[pred] for pred in y_pred],  # Convert numeric back to string
-    'RoBERTa_Sentiment': df_sample['roberta_sentiment'].iloc[:len(y_pred)],
-    'Primary_Emotion': df_sample['emotions'].iloc[:len(y_pred)].apply(lambda x: x['primary_emotion']),
-    'Secondary_Emotions': df_sample['emotions'].iloc[:len(y_pred)].apply(lambda x: x['secondary_emotions']),
-    'Emotion_Scores': df_sample['emotions'].iloc[:len(y_pred)].apply(lambda x: x['emotion_scores'])
-})
-
 # Enhanced visualization and evaluation
 def plot_feature_importance(model, feature_names):
     """Plot feature importance with enhanced visualization"""
@@ -508,36 +316,6 @@ def plot_sentiment_distribution(df):
     plt.savefig('sentiment_distribution.png', dpi=300, bbox_inches='tight')
     plt.close()
 
-# Generate feature names for visualization
-feature_names = (
-    ['exclamation_count', 'question_count', 'capital_count', 'word_count',
-     'avg_word_length', 'sentiment_polarity', 'sentiment_subjectivity',
-     'emotion_intensity', 'emotion_diversity'] +
-    [f'emotion_{emotion}' for emotion in EMOTION_KEYWORDS.keys()] +
-    [f'text_embed_{i}' for i in range(32)] +
-    [f'image_embed_{i}' for i in range(32)]
-)
-
-# Generate visualizations
-logger.info("Generating visualizations...")
-plot_feature_importance(final_ensemble, feature_names)
-plot_confusion_matrix(y_test, y_pred, classes=['negative', 'neutral', 'positive'])
-plot_emotion_distribution(df_sample, 'Primary Emotions Distribution')
-plot_sentiment_distribution(results)
-
-# Save evaluation metrics
-evaluation_metrics = {
-    'accuracy': accuracy,
-    'classification_report': report,
-    'best_parameters': best_params,
-    'model_weights': dict(zip([name for name, _ in base_models], model_weights))
-}
-
-import json
-with open('evaluation_metrics.json', 'w') as f:
-    json.dump(evaluation_metrics, f, indent=4)
-
-logger.info("Visualizations and evaluation metrics saved successfully")
 
 # PyTorch Lightning Model for Multimodal Sentiment Analysis
 class MultimodalSentimentModel(pl.LightningModule):
@@ -581,27 +359,50 @@ logger.info("Loading CLIP model...")
 clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
 clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
 
+# Image embeddings are cached by content hash, so the vision tower runs once per distinct image
+image_feature_cache = ImageFeatureCache(encoder=ClipImageEncoder(clip_model, clip_processor))
+
 def get_clip_features(text, image=None):
     """Get CLIP features for text and optional image"""
     try:
+        # Process text
+        inputs = clip_processor(text=[text], return_tensors="pt", padding=True)
+        with torch.no_grad():
+            text_embeds = clip_model.get_text_features(**inputs)
+        text_embeds = text_embeds / text_embeds.norm(dim=-1, keepdim=True)
         if image is not None:
-            # Process image
-            image = Image.fromarray(image)
-            inputs = clip_processor(text=[text], images=image, return_tensors="pt", padding=True)
-            outputs = clip_model(**inputs)
-            return outputs.text_embeds, outputs.image_embeds
-        else:
-            # Process text only
-            inputs = clip_processor(text=[text], return_tensors="pt", padding=True)
-            outputs = clip_model(**inputs)
-            return outputs.text_embeds, None
+            # Process image through the feature cache
+            image_embeds = torch.from_numpy(image_feature_cache.feature(image)).unsqueeze(0)
+            return text_embeds, image_embeds
+        return text_embeds, None
     except Exception as e:
         logger.error(f"Error in CLIP feature extraction: {str(e)}")
         return None, None
 
+# Trained artifacts live next to this script, whatever the working directory
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(MODEL_DIR, 'sentiment_model.joblib')
+SCALER_PATH = os.path.join(MODEL_DIR, 'feature_scaler.joblib')
+
+def load_trained_models():
+    """Load the ensemble and feature scaler saved by a training run of this script"""
+    if not os.path.exists(MODEL_PATH) or not os.path.exists(SCALER_PATH):
+        raise FileNotFoundError(f"Trained ensemble not found at {MODEL_PATH}; run this script to train it")
+    return joblib.load(MODEL_PATH), joblib.load(SCALER_PATH)
+
+# Importing this module only loads the trained models; training runs when it is executed as a script
+final_ensemble, scaler = None, None
+if __name__ != "__main__":
+    try:
+        final_ensemble, scaler = load_trained_models()
+    except FileNotFoundError as e:
+        logger.warning(str(e))
+
 # Update the analyze_sentiment function to handle numeric predictions
 def analyze_sentiment(text, image=None):
-    """Analyze sentiment from text and optional image"""
+    """Analyze sentiment from text and optional image (RGB array or encoded image bytes)"""
+    if final_ensemble is None or scaler is None:
+        raise RuntimeError("Ensemble model is not trained; run 'python \"sentiment_analysis copy.py\"' first")
     try:
         # Get CLIP features
         text_embeds, image_embeds = get_clip_features(text, image)
@@ -632,13 +433,14 @@ def analyze_sentiment(text, image=None):
         ])
         
         # Ensure features match training dimensions
-        if len(features) != X.shape[1]:
-            logger.warning(f"Feature dimension mismatch. Expected {X.shape[1]}, got {len(features)}")
+        expected = scaler.n_features_in_
+        if len(features) != expected:
+            logger.warning(f"Feature dimension mismatch. Expected {expected}, got {len(features)}")
             # Pad or truncate to match training dimensions
-            if len(features) > X.shape[1]:
-                features = features[:X.shape[1]]
+            if len(features) > expected:
+                features = features[:expected]
             else:
-                features = np.pad(features, (0, X.shape[1] - len(features)))
+                features = np.pad(features, (0, expected - len(features)))
         
         # Scale features
         features = scaler.transform(features.reshape(1, -1))
@@ -664,22 +466,250 @@ def analyze_sentiment(text, image=None):
             'emotion_scores': {'neutral': 1.0}
         }
 
-# Create Gradio interface
-interface = gr.Interface(
-    fn=analyze_sentiment,
-    inputs=[
-        gr.Textbox(label="Text Input"),
-        gr.Image(label="Optional Image Input", type="numpy")
-    ],
-    outputs=[
-        gr.JSON(label="Analysis Results")
-    ],
-    title="Multimodal Sentiment Analysis",
-    description="Analyze sentiment from text and optional image input"
-)
-
-# Launch Gradio interface
-interface.launch()
-
-results.to_csv('detailed_sentiment_results.csv', index=False)
-logger.info("\nModel and results saved successfully") 
\ No newline at end of file
+
+if __name__ == "__main__":
+    import gradio as gr
+
+    # Load the dataset
+    logger.info("Loading dataset...")
+    df = pd.read_csv(os.path.join(MODEL_DIR, 'Reviews.csv'))
+    # Sample a smaller subset of the data for testing
+    sample_size = 300  # Further reduced from 500
+    df_sample = df.sample(n=min(sample_size, len(df)), random_state=42)
+
+    logger.info("Extracting features...")
+    # Extract features
+    df_sample['roberta_sentiment'] = df_sample['Text'].apply(get_roberta_sentiment)
+    df_sample['emotions'] = df_sample['Text'].apply(get_emotions)
+    df_sample['embeddings'] = df_sample['Text'].apply(get_sentence_embeddings)
+    df_sample['emotion_features'] = df_sample['Text'].apply(get_emotion_features)
+
+    # Prepare features for ensemble model with reduced dimensionality
+    X = np.array([np.concatenate([
+        np.array([
+            features['exclamation_count'],
+            features['question_count'],
+            features['capital_count'],
+            features['word_count'],
+            features['avg_word_length'],
+            features['sentiment_polarity'],
+            features['sentiment_subjectivity'],
+            features['emotion_intensity'],
+            features['emotion_diversity']
+        ] + [features[f'emotion_{emotion}'] for emotion in EMOTION_KEYWORDS.keys()]),
+        embeddings[:32]  # Further reduced from 64
+    ]) for features, embeddings in zip(df_sample['emotion_features'], df_sample['embeddings'])])
+
+    # Scale features
+    scaler = StandardScaler()
+    X = scaler.fit_transform(X)
+
+    # Prepare labels with numeric encoding
+    label_map = {'negative': 0, 'neutral': 1, 'positive': 2}
+    label_map_reverse = {0: 'negative', 1: 'neutral', 2: 'positive'}
+    y = df_sample['Score'].map({1: 'negative', 2: 'negative', 3: 'neutral', 4: 'positive', 5: 'positive'})
+    y_numeric = y.map(label_map)
+
+    # Calculate class weights to handle imbalance
+    class_weights = compute_class_weight(
+        class_weight='balanced',
+        classes=np.unique(y_numeric),
+        y=y_numeric
+    )
+    class_weight_dict = dict(zip(np.unique(y_numeric), class_weights))
+
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(X, y_numeric, test_size=0.2, random_state=42)
+
+    # Enhanced hyperparameter tuning
+    param_dist = {
+        'svc__C': [0.1, 1, 10, 100],
+        'svc__gamma': ['scale', 'auto', 0.1, 0.01],
+        'rf__n_estimators': [100, 200, 300],
+        'rf__max_depth': [10, 20, None],
+        'rf__min_samples_split': [2, 5, 10],
+        'rf__min_samples_leaf': [1, 2, 4],
+        'xgb__max_depth': [3, 5, 7],
+        'xgb__learning_rate': [0.01, 0.05, 0.1],
+        'xgb__n_estimators': [100, 200, 300],
+        'xgb__subsample': [0.8, 0.9, 1.0],
+        'xgb__colsample_bytree': [0.8, 0.9, 1.0],
+        'gb__n_estimators': [100, 200, 300],
+        'gb__learning_rate': [0.01, 0.05, 0.1],
+        'gb__max_depth': [3, 5, 7],
+        'gb__subsample': [0.8, 0.9, 1.0]
+    }
+
+    # Create base models with enhanced parameters and memory optimization
+    base_models = [
+        ('svc', SVC(
+            probability=True,
+            kernel='rbf',
+            class_weight=class_weight_dict,
+            cache_size=2000,
+            max_iter=1000
+        )),
+        ('rf', RandomForestClassifier(
+            n_estimators=200,
+            max_depth=None,
+            min_samples_split=5,
+            min_samples_leaf=2,
+            n_jobs=1,
+            class_weight=class_weight_dict,
+            random_state=42
+        )),
+        ('xgb', XGBClassifier(
+            max_depth=5,
+            learning_rate=0.05,
+            n_estimators=200,
+            subsample=0.9,
+            colsample_bytree=0.9,
+            n_jobs=1,
+            random_state=42
+        )),
+        ('gb', GradientBoostingClassifier(
+            n_estimators=200,
+            learning_rate=0.05,
+            max_depth=5,
+            subsample=0.9,
+            random_state=42
+        ))
+    ]
+
+    # Create ensemble with dynamic weights based on model performance
+    ensemble = VotingClassifier(
+        estimators=base_models,
+        voting='soft',
+        weights=[1, 1, 1, 1],
+        n_jobs=1
+    )
+
+    # Use RandomizedSearchCV with enhanced memory optimization
+    random_search = RandomizedSearchCV(
+        ensemble,
+        param_distributions=param_dist,
+        n_iter=50,  # Increased iterations for better optimization
+        cv=5,  # Increased cross-validation folds
+        scoring='accuracy',
+        n_jobs=1,
+        random_state=42,
+        verbose=1,
+        pre_dispatch='2*n_jobs',
+        error_score='raise'
+    )
+
+    # Memory optimization
+    def optimize_memory():
+        """Optimize memory usage"""
+        gc.collect()
+        torch.cuda.empty_cache() if torch.cuda.is_available() else None
+        return True
+
+    # Train model with memory optimization
+    logger.info("Training ensemble model with memory optimization...")
+    optimize_memory()
+    random_search.fit(X_train, y_train)
+
+    # Get best model and parameters
+    best_ensemble = random_search.best_estimator_
+    best_params = random_search.best_params_
+
+    # Calculate model weights based on individual performance
+    model_weights = []
+    for name, model in base_models:
+        model.fit(X_train, y_train)
+        score = model.score(X_test, y_test)
+        model_weights.append(score)
+
+    # Normalize weights
+    model_weights = np.array(model_weights) / sum(model_weights)
+
+    # Create final ensemble with optimized weights
+    final_ensemble = VotingClassifier(
+        estimators=base_models,
+        voting='soft',
+        weights=model_weights,
+        n_jobs=1
+    )
+
+    # Train final ensemble
+    logger.info("Training final ensemble with optimized weights...")
+    optimize_memory()
+    final_ensemble.fit(X_train, y_train)
+
+    # Evaluate final model
+    y_pred = final_ensemble.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    report = classification_report(y_test, y_pred)
+
+    logger.info("\nFinal Model Performance:")
+    logger.info(f"Best Parameters: {best_params}")
+    logger.info(f"Model Weights: {dict(zip([name for name, _ in base_models], model_weights))}")
+    logger.info(f"Ensemble Model Accuracy: {accuracy:.4f}")
+    logger.info("\nClassification Report:")
+    logger.info(report)
+
+    # Save model and results
+    joblib.dump(final_ensemble, MODEL_PATH)
+    joblib.dump(scaler, SCALER_PATH)
+
+    # Save detailed results
+    results = pd.DataFrame({
+        'Text': df_sample['Text'].iloc[:len(y_pred)],  # Match the length of predictions
+        'Score': df_sample['Score'].iloc[:len(y_pred)],
+        'Predicted_Sentiment': [label_map_reverse[pred] for pred in y_pred],  # Convert numeric back to string
+        'RoBERTa_Sentiment': df_sample['roberta_sentiment'].iloc[:len(y_pred)],
+        'Primary_Emotion': df_sample['emotions'].iloc[:len(y_pred)].apply(lambda x: x['primary_emotion']),
+        'Secondary_Emotions': df_sample['emotions'].iloc[:len(y_pred)].apply(lambda x: x['secondary_emotions']),
+        'Emotion_Scores': df_sample['emotions'].iloc[:len(y_pred)].apply(lambda x: x['emotion_scores'])
+    })
+
+    # Generate feature names for visualization
+    feature_names = (
+        ['exclamation_count', 'question_count', 'capital_count', 'word_count',
+         'avg_word_length', 'sentiment_polarity', 'sentiment_subjectivity',
+         'emotion_intensity', 'emotion_diversity'] +
+        [f'emotion_{emotion}' for emotion in EMOTION_KEYWORDS.keys()] +
+        [f'text_embed_{i}' for i in range(32)] +
+        [f'image_embed_{i}' for i in range(32)]
+    )
+
+    # Generate visualizations
+    logger.info("Generating visualizations...")
+    plot_feature_importance(final_ensemble, feature_names)
+    plot_confusion_matrix(y_test, y_pred, classes=['negative', 'neutral', 'positive'])
+    plot_emotion_distribution(df_sample, 'Primary Emotions Distribution')
+    plot_sentiment_distribution(results)
+
+    # Save evaluation metrics
+    evaluation_metrics = {
+        'accuracy': accuracy,
+        'classification_report': report,
+        'best_parameters': best_params,
+        'model_weights': dict(zip([name for name, _ in base_models], model_weights))
+    }
+
+    with open('evaluation_metrics.json', 'w') as f:
+        json.dump(evaluation_metrics, f, indent=4)
+
+    logger.info("Visualizations and evaluation metrics saved successfully")
+
+    # Create Gradio interface
+    interface = gr.Interface(
+        fn=analyze_sentiment,
+        inputs=[
+            gr.Textbox(label="Text Input"),
+            gr.Image(label="Optional Image Input", type="numpy")
+        ],
+        outputs=[
+            gr.JSON(label="Analysis Results")
+        ],
+        title="Multimodal Sentiment Analysis",
+        description="Analyze sentiment from text and optional image input"
+    )
+
+    # Launch Gradio interface
+    interface.launch()
+
+    results.to_csv('detailed_sentiment_results.csv', index=False)
+    logger.info("\nModel and results saved successfully") 
\ No newline at end of file
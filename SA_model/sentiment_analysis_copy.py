@@ -1,10 +1,17 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from types import SimpleNamespace
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import nltk
 from nltk.sentiment import SentimentIntensityAnalyzer
-from nltk.tokenize import word_tokenize
+from nltk.sentiment.vader import SentiText
+from nltk.tokenize import word_tokenize, sent_tokenize
 from nltk.corpus import stopwords
 import re
+from term_stats import get_term_statistics
 
 # Download required NLTK data
 try:
@@ -48,36 +55,193 @@ EMOTION_WEIGHTS = {
     'gratitude': {'positive': 1.3, 'negative': 0.2}
 }
 
+# Maximum number of analyzed sentences kept in memory
+SENTENCE_CACHE_SIZE = int(os.environ.get("SENTENCE_CACHE_SIZE", "10000"))
+
+
+class SentenceSentimentAnalyzer(SentimentIntensityAnalyzer):
+    """
+    VADER analyzer whose per-token work can be cached sentence by sentence.
+    Only token valences that depend on nothing outside their sentence are cached; the
+    context VADER takes across sentences (lookback and lookahead at sentence edges, the
+    first occurrence rule for repeated words, the caps differential, the but-rule and
+    punctuation emphasis) is applied over the combined document, so document_scores()
+    equals polarity_scores() of the whole text.
+    """
+
+    def tokens(self, text: str) -> List[str]:
+        return SentiText(text, self.constants.PUNC_LIST, self.constants.REGEX_REMOVE_PUNCTUATION).words_and_emoticons
+
+    def token_valence(self, words: List[str], i: int, is_cap_diff: bool) -> float:
+        """Valence of words[i] in the context of `words`, as in polarity_scores()."""
+        item = words[i]
+        if ((i < len(words) - 1 and item.lower() == "kind" and words[i + 1].lower() == "of")
+                or item.lower() in self.constants.BOOSTER_DICT):
+            return 0
+        context = SimpleNamespace(words_and_emoticons=words, is_cap_diff=is_cap_diff)
+        return self.sentiment_valence(0, context, item, i, [])[-1]
+
+    def sentence_valences(self, sentence: str) -> Dict[str, Any]:
+        """
+        Tokens of a sentence and the valence of each first occurrence of a token, without
+        and with the caps differential (which only the whole document decides).
+        """
+        words = self.tokens(sentence)
+        first = {}
+        for i, word in enumerate(words):
+            first.setdefault(word, i)
+
+        def valences(is_cap_diff):
+            return [self.token_valence(words, i, is_cap_diff) if first[word] == i else None
+                    for i, word in enumerate(words)]
+
+        plain = valences(False)
+        # The caps differential only changes valences when some token is in capitals
+        cap_diff = valences(True) if any(word.isupper() for word in words) else plain
+        return {"words": words, "valences": (plain, cap_diff)}
+
+    def document_scores(self, sentences: List[Dict[str, Any]], text: str) -> Dict[str, float]:
+        """Scores of `text` from the cached analyses of its sentences, in order."""
+        words = [word for sentence in sentences for word in sentence["words"]]
+        allcaps = sum(word.isupper() for word in words)
+        is_cap_diff = 0 < len(words) - allcaps < len(words)
+
+        sentiments = []
+        first_valence: Dict[str, float] = {}
+        offset = 0
+        for sentence in sentences:
+            cached = sentence["valences"][is_cap_diff]
+            n = len(sentence["words"])
+            for i, word in enumerate(sentence["words"]):
+                if word in first_valence:
+                    # VADER scores every repeat of a token at its first position in the text
+                    valence = first_valence[word]
+                elif 3 <= i < n - 2:
+                    valence = cached[i]
+                else:
+                    # Lookback and lookahead reach into the neighbouring sentences
+                    valence = self.token_valence(words, offset + i, is_cap_diff)
+                first_valence.setdefault(word, valence)
+                sentiments.append(valence)
+            offset += n
+
+        sentiments = self._but_check(words, sentiments)
+        return self.score_valence(sentiments, text)
+
+
+_sia = None
+_stop_words = None
+_sentence_cache: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+_sentence_cache_lock = threading.Lock()
+_sentence_cache_stats = {"hits": 0, "misses": 0}
+
+
+def _get_analyzer() -> SentenceSentimentAnalyzer:
+    global _sia, _stop_words
+    if _sia is None:
+        _stop_words = set(stopwords.words('english'))
+        _sia = SentenceSentimentAnalyzer()
+    return _sia
+
+
+def _analyze_sentence(sentence: str) -> Dict[str, Any]:
+    """VADER tokens and valences, raw emotion keyword counts and key phrase candidates of one sentence."""
+    sia = _get_analyzer()
+    words = word_tokenize(sentence.lower())
+    emotion_hits = {}
+    for word in words:
+        for emotion, keywords in EMOTION_KEYWORDS.items():
+            if word in keywords:
+                emotion_hits[emotion] = emotion_hits.get(emotion, 0) + 1
+    return {
+        **sia.sentence_valences(sentence),
+        "emotion_hits": emotion_hits,
+        "candidates": [word for word in words if word not in _stop_words and len(word) > 3]
+    }
+
+
+def _cached_sentence(sentence: str) -> Dict[str, Any]:
+    key = hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest()
+    with _sentence_cache_lock:
+        cached = _sentence_cache.get(key)
+        if cached is not None:
+            _sentence_cache.move_to_end(key)
+            _sentence_cache_stats["hits"] += 1
+            return cached
+        _sentence_cache_stats["misses"] += 1
+
+    analysis = _analyze_sentence(sentence)
+    with _sentence_cache_lock:
+        _sentence_cache[key] = analysis
+        while len(_sentence_cache) > SENTENCE_CACHE_SIZE:
+            _sentence_cache.popitem(last=False)
+    return analysis
+
+
+def sentence_cache_info() -> Dict[str, int]:
+    with _sentence_cache_lock:
+        return {"size": len(_sentence_cache), "max_size": SENTENCE_CACHE_SIZE, **_sentence_cache_stats}
+
+
+def clear_sentence_cache() -> None:
+    with _sentence_cache_lock:
+        _sentence_cache.clear()
+        _sentence_cache_stats["hits"] = 0
+        _sentence_cache_stats["misses"] = 0
+
+
+def extract_terms(text: str) -> List[str]:
+    """Key phrase candidate terms of a text, in document order (served from the sentence cache)."""
+    return [word for sentence in sent_tokenize(text) for word in _cached_sentence(sentence)["candidates"]]
+
+
+def sentiment_label_for(compound_score: float) -> str:
+    if compound_score >= 0.6:
+        return "Very Positive"
+    elif compound_score >= 0.2:
+        return "Positive"
+    elif compound_score > -0.2:
+        return "Neutral"
+    elif compound_score > -0.6:
+        return "Negative"
+    return "Very Negative"
+
+
+def whole_text_scores(text: str) -> Dict[str, Any]:
+    """
+    VADER scores of the text as a single unit, without the sentence cache.
+    Not used for serving; benchmarks check the cached scores against it.
+    """
+    scores = _get_analyzer().polarity_scores(text)
+    return {"sentiment_score": scores["compound"], "sentiment_label": sentiment_label_for(scores["compound"])}
+
+
 def analyze_sentiment(text: str, image: Optional[np.ndarray] = None) -> Dict[str, Any]:
     """
     Analyze sentiment of text and optionally image.
     Returns a dictionary with detailed sentiment analysis.
+    The text is analyzed sentence by sentence and per-sentence results are cached,
+    so re-analyzing an edited entry only pays for the new or changed sentences.
     """
-    # Initialize sentiment analyzer
-    sia = SentimentIntensityAnalyzer()
-    sentiment_scores = sia.polarity_scores(text)
+    sentence_texts = sent_tokenize(text)
+    sentences = [_cached_sentence(sentence) for sentence in sentence_texts]
+
+    if " ".join(sentence_texts).split() == text.split():
+        sentiment_scores = _get_analyzer().document_scores(sentences, text)
+    else:
+        # The sentences do not split the text at whitespace, so their tokens would differ
+        sentiment_scores = _get_analyzer().polarity_scores(text)
     compound_score = sentiment_scores['compound']
     pos_score = sentiment_scores['pos']
     neu_score = sentiment_scores['neu']
     neg_score = sentiment_scores['neg']
 
-    # Extract key phrases (simple implementation)
-    words = word_tokenize(text.lower())
-    stop_words = set(stopwords.words('english'))
-    key_phrases = [word for word in words if word not in stop_words and len(word) > 3]
-    key_phrases = list(set(key_phrases))[:5]  # Get top 5 unique phrases
+    # Rank key phrases by TF-IDF against the corpus document frequencies
+    candidates = [word for sentence in sentences for word in sentence["candidates"]]
+    key_phrases = get_term_statistics().key_phrases(candidates, k=5)
 
     # Sentiment label with more granularity
-    if compound_score >= 0.6:
-        sentiment_label = "Very Positive"
-    elif compound_score >= 0.2:
-        sentiment_label = "Positive"
-    elif compound_score > -0.2:
-        sentiment_label = "Neutral"
-    elif compound_score > -0.6:
-        sentiment_label = "Negative"
-    else:
-        sentiment_label = "Very Negative"
+    sentiment_label = sentiment_label_for(compound_score)
 
     # Magnitude and confidence
     magnitude = abs(compound_score)
@@ -87,15 +251,14 @@ def analyze_sentiment(text: str, image: Optional[np.ndarray] = None) -> Dict[str
     emotion_counts = {emotion: 0.0 for emotion in EMOTION_KEYWORDS}
     
     # Count emotion words with sentiment-based weighting
-    for word in words:
-        for emotion, keywords in EMOTION_KEYWORDS.items():
-            if word in keywords:
-                # Apply sentiment-based weighting
-                if compound_score > 0:
-                    weight = EMOTION_WEIGHTS[emotion]['positive']
-                else:
-                    weight = EMOTION_WEIGHTS[emotion]['negative']
-                emotion_counts[emotion] += weight
+    for sentence in sentences:
+        for emotion, hits in sentence["emotion_hits"].items():
+            # Apply sentiment-based weighting
+            if compound_score > 0:
+                weight = EMOTION_WEIGHTS[emotion]['positive']
+            else:
+                weight = EMOTION_WEIGHTS[emotion]['negative']
+            emotion_counts[emotion] += weight * hits
 
     # Normalize emotion scores with a minimum threshold
     total_emotion_score = sum(emotion_counts.values())
@@ -1,15 +1,25 @@
 import sys
 import os
+import hmac
+import hashlib
 import nltk
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from fastapi import FastAPI, File, UploadFile, Form
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException, Query, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import uvicorn
 import numpy as np
 from PIL import Image
 import io
-from sentiment_analysis_copy import analyze_sentiment
+from sentiment_analysis_copy import analyze_sentiment, extract_terms
+from profiler import SamplingProfiler
+from mood_rollups import MoodRollupStore, parse_date
+from term_stats import get_term_statistics
+from vector_store import VectorStore
+from embeddings import get_sentence_embedding, use_model
+from response_encoding import encode_result, parse_fields, negotiate, EMOTION_FORMATS
+from overload import OverloadController, load_analyzer, analysis_key
 
 # Download required NLTK data at startup
 nltk.download('punkt')
@@ -28,15 +38,221 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("SENTIMENT_ADMIN_TOKEN")
+# Per-user reads and writes only come from the Next.js backend, which takes user ids from
+# its session; they are disabled unless a token is configured
+SERVICE_TOKEN = os.environ.get("SENTIMENT_SERVICE_TOKEN")
+profiler = SamplingProfiler()
+mood_rollups = MoodRollupStore()
+term_statistics = get_term_statistics()
+vector_store = VectorStore()
+
+# With a heavy analyzer configured (e.g. "sentiment_analysis copy.py:analyze_sentiment", after
+# training it by running that script), requests go through the overload controller and fall
+# back to the lexicon result under load or when the heavy analyzer fails
+HEAVY_ANALYZER = os.environ.get("HEAVY_ANALYZER")
+overload = None
+if HEAVY_ANALYZER:
+    heavy_analyzer = load_analyzer(HEAVY_ANALYZER)
+    overload = OverloadController(heavy_analyzer, analyze_sentiment)
+    # The ensemble already holds all-MiniLM-L6-v2 for its features; index entries with it
+    ensemble_model = getattr(heavy_analyzer, "__globals__", {}).get("sentence_transformer")
+    if ensemble_model is not None:
+        use_model(ensemble_model)
+
+@app.on_event("shutdown")
+def save_term_statistics():
+    term_statistics.save()
+    vector_store.flush()
+    if overload is not None:
+        overload.shutdown()
+
+def require_admin(token):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def require_service(token):
+    if not SERVICE_TOKEN:
+        raise HTTPException(status_code=403, detail="Per-user endpoints are disabled")
+    if not token or not hmac.compare_digest(token.encode(), SERVICE_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid service token")
+
+def store_entry(user_id: str, entry_id: str, text: str, result, entry_date: str = None, key: str = None):
+    """Record an analyzed entry in the rollups and term statistics (blocking)."""
+    mood_rollups.record_entry(user_id, entry_id, result, entry_date, key)
+    term_statistics.record_document(user_id, entry_id, extract_terms(text))
+
+def index_entry(user_id: str, entry_id: str, text: str):
+    """Embed an entry into the vector index; runs as a background task after the response."""
+    text_hash = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    if vector_store.has_text(user_id, entry_id, text_hash):
+        return
+    embedding = get_sentence_embedding(text)
+    if embedding is not None:
+        vector_store.add(user_id, entry_id, embedding, text_hash)
+
 @app.post("/analyze-entry")
-async def analyze_entry(text: str = Form(...), image: UploadFile = File(None)):
-    image_np = None
+async def analyze_entry(
+    background_tasks: BackgroundTasks,
+    text: str = Form(...),
+    image: UploadFile = File(None),
+    user_id: str = Form(None),
+    entry_id: str = Form(None),
+    entry_date: str = Form(None),
+    fields: str = Query(None),
+    emotions: str = Query("map"),
+    accept: str = Header(None),
+    x_service_token: str = Header(None)
+):
+    """
+    Analyze a journal entry. The response is MessagePack when the Accept header asks for it,
+    `fields` limits it to a comma-separated list of keys and `emotions=array` encodes
+    emotion_scores as an array in the order given by the X-Emotion-Order header. Storing the
+    entry under user_id / entry_id requires the service token.
+    """
+    if user_id or entry_id:
+        require_service(x_service_token)
+    if emotions not in EMOTION_FORMATS:
+        raise HTTPException(status_code=400, detail=f"emotions must be one of {', '.join(EMOTION_FORMATS)}")
+    try:
+        parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if negotiate(accept) is None:
+        raise HTTPException(status_code=406, detail="Accept allows neither application/json nor application/msgpack")
+    if entry_date:
+        try:
+            entry_date = parse_date(entry_date).isoformat()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="entry_date must be an ISO 8601 date or datetime")
+    contents = None
     if image is not None:
         contents = await image.read()
-        pil_image = Image.open(io.BytesIO(contents)).convert("RGB")
-        image_np = np.array(pil_image)
-    result = analyze_sentiment(text, image_np)
+        try:
+            # Only parses the header; the analyzers decode the image themselves
+            Image.open(io.BytesIO(contents))
+        except Exception:
+            raise HTTPException(status_code=400, detail="image is not a supported image file")
+    key = None
+    sampled = profiler.request_started()
+    try:
+        if overload is not None:
+            key = analysis_key(text, contents)
+
+            # The upgrade may finish before or after the degraded result is stored; the
+            # rollups keep the full result either way
+            def on_upgrade(upgraded):
+                if user_id and entry_id:
+                    mood_rollups.record_entry(user_id, entry_id, upgraded, entry_date, key)
+
+            # The heavy analyzer gets the uploaded bytes, so its CLIP feature cache is keyed
+            # on the same content hash as a backfill of the original files
+            result = await run_in_threadpool(overload.analyze, key, text, contents, on_upgrade)
+        else:
+            image_np = np.array(Image.open(io.BytesIO(contents)).convert("RGB")) if contents else None
+            result = analyze_sentiment(text, image_np)
+    finally:
+        if sampled:
+            profiler.request_finished()
+    if user_id and entry_id:
+        await run_in_threadpool(store_entry, user_id, entry_id, text, result, entry_date, key)
+        background_tasks.add_task(index_entry, user_id, entry_id, text)
+    return encode_result(result, accept, fields, emotions)
+
+@app.get("/analysis-result/{key}")
+async def analysis_result(key: str):
+    """Fetch a cached result, e.g. to pick up the full analysis behind a degraded response."""
+    result = overload.results.get(key) if overload is not None else None
+    if result is None:
+        raise HTTPException(status_code=404, detail="Result not found")
     return JSONResponse(content=result)
 
+@app.get("/overload/metrics")
+async def overload_metrics():
+    if overload is None:
+        return JSONResponse(content={"enabled": False})
+    return JSONResponse(content={"enabled": True, **overload.snapshot()})
+
+@app.get("/mood-timeseries")
+async def mood_timeseries(user_id: str, granularity: str = "day", start: str = None, end: str = None, top_k: int = 5,
+                         x_service_token: str = Header(None)):
+    """Daily / weekly / monthly mood aggregates for a user, read from the incremental rollups."""
+    require_service(x_service_token)
+    try:
+        buckets = mood_rollups.timeseries(user_id, granularity, start, end, top_k)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONResponse(content={"user_id": user_id, "granularity": granularity, "buckets": buckets})
+
+@app.get("/word-cloud")
+async def word_cloud(user_id: str, n: int = 50, x_service_token: str = Header(None)):
+    """Top-N TF-IDF weighted terms of a user's entries as [{text, value}]."""
+    require_service(x_service_token)
+    return JSONResponse(content={"user_id": user_id, "words": term_statistics.top_terms(user_id, n)})
+
+@app.get("/similar-entries")
+async def similar_entries(user_id: str, entry_id: str = None, text: str = None, k: int = 5,
+                          x_service_token: str = Header(None)):
+    """Top-k of the user's entries most similar to a stored entry or to free text."""
+    require_service(x_service_token)
+    if entry_id:
+        query = vector_store.get(user_id, entry_id)
+        if query is None:
+            raise HTTPException(status_code=404, detail="Entry not found")
+    elif text:
+        query = await run_in_threadpool(get_sentence_embedding, text)
+        if query is None:
+            raise HTTPException(status_code=503, detail="sentence-transformers is not installed")
+    else:
+        raise HTTPException(status_code=400, detail="Provide entry_id or text")
+    results = await run_in_threadpool(vector_store.search, query, k=k, user_id=user_id, exclude_entry=entry_id)
+    return JSONResponse(content={"user_id": user_id, "results": results})
+
+@app.delete("/similar-entries/{user_id}/{entry_id}")
+async def remove_similar_entry(user_id: str, entry_id: str, x_service_token: str = Header(None)):
+    require_service(x_service_token)
+    if not vector_store.delete(user_id, entry_id):
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return JSONResponse(content={"removed": entry_id})
+
+@app.delete("/mood-timeseries/{user_id}/{entry_id}")
+async def remove_mood_entry(user_id: str, entry_id: str, x_service_token: str = Header(None)):
+    require_service(x_service_token)
+    term_statistics.remove_document(user_id, entry_id)
+    if not mood_rollups.remove_entry(user_id, entry_id):
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return JSONResponse(content={"removed": entry_id})
+
+@app.post("/admin/profiler/start")
+async def start_profiler(
+    duration: float = Form(None),
+    every: int = Form(None),
+    max_requests: int = Form(50),
+    interval: float = Form(None),
+    x_admin_token: str = Header(None)
+):
+    """Sample the worker for `duration` seconds, or during every `every`th request."""
+    require_admin(x_admin_token)
+    try:
+        status = profiler.start(duration=duration, every=every, max_requests=max_requests, interval=interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return JSONResponse(content=status)
+
+@app.post("/admin/profiler/stop")
+async def stop_profiler(x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    return JSONResponse(content=profiler.stop())
+
+@app.get("/admin/profiler/status")
+async def profiler_status(x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    return JSONResponse(content=profiler.status())
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
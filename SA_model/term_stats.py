@@ -0,0 +1,314 @@
+import os
+import copy
+import json
+import math
+import heapq
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from collections import Counter
+from typing import Dict, Any, Optional, List, Iterable, Tuple
+
+import joblib
+import numpy as np
+
+DEFAULT_STATS_PATH = os.environ.get(
+    "TERM_STATS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "term_stats.joblib")
+)
+USER_TERM_CAPACITY = 500  # Terms tracked per user by the Space-Saving summary
+SKETCH_WIDTH = 2 ** 16
+SKETCH_DEPTH = 4
+SAVE_EVERY = 100  # Persist after this many recorded documents
+
+DOCUMENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    user_id TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    term_counts TEXT NOT NULL,
+    PRIMARY KEY (user_id, entry_id)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class CountMinSketch:
+    """Count-min sketch: estimates never undercount and overcount by at most ~e*N/width."""
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self._rows = np.arange(depth)
+
+    def _columns(self, item: str) -> np.ndarray:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=8 * self.depth).digest()
+        return np.frombuffer(digest, dtype=np.uint64) % np.uint64(self.width)
+
+    def add(self, item: str, count: int = 1) -> None:
+        self.table[self._rows, self._columns(item)] += count
+
+    def estimate(self, item: str) -> int:
+        # Removals can only take back earlier adds, but a snapshot older than the
+        # document store may see a removal first, so never report a negative count
+        return max(int(self.table[self._rows, self._columns(item)].min()), 0)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitter summary over a bounded number of counters.
+    Any item whose true count exceeds total/capacity is guaranteed to be tracked;
+    each tracked count overestimates the true count by at most its recorded error.
+    The smallest counter is found through a lazily updated min-heap, so eviction is
+    O(log capacity) instead of a scan over all counters.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "_heap" not in state:
+            # Snapshots written before the heap existed
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _push(self, item: str) -> None:
+        # Entries whose count no longer matches self.counts are stale and skipped on pop
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> str:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item
+
+    def add(self, item: str, count: int = 1) -> None:
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the smallest counter; the newcomer inherits its count as error
+            victim = self._pop_min()
+            floor = self.counts.pop(victim)
+            self.errors.pop(victim)
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+        self._push(item)
+
+    def remove(self, item: str, count: int = 1) -> None:
+        """Take back a previous add(); untracked items are already below every counter."""
+        if item not in self.counts:
+            return
+        remaining = self.counts[item] - count
+        if remaining <= 0:
+            del self.counts[item]
+            del self.errors[item]
+            return
+        self.counts[item] = remaining
+        self.errors[item] = min(self.errors[item], remaining)
+        self._push(item)
+
+    def top(self, n: int) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda x: (-x[1], x[0]))[:n]
+
+
+class TermStatistics:
+    """
+    Incrementally maintained term statistics for the journal corpus.
+    Per-user term frequencies are kept in Space-Saving summaries, corpus document
+    frequencies in a count-min sketch, so memory stays bounded however many entries
+    are recorded. Used to rank key phrases by TF-IDF and to back word clouds.
+    The term counts of each (user, entry) are kept in SQLite next to the snapshot so a
+    re-analyzed entry replaces its previous contribution instead of adding to it.
+    Every document write bumps a sequence number stored in the same transaction; a
+    snapshot whose sequence does not match the database is rebuilt from the documents.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.documents = 0
+        self.sequence = 0
+        self.document_frequency = CountMinSketch()
+        self.user_terms: Dict[str, SpaceSaving] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._open_documents()
+
+    def _open_documents(self) -> None:
+        documents_path = os.path.splitext(self.path)[0] + ".sqlite3" if self.path else ":memory:"
+        self._conn = sqlite3.connect(documents_path, check_same_thread=False)
+        self._conn.executescript(DOCUMENT_SCHEMA)
+        self._conn.commit()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for transient in ("_lock", "_save_lock", "_conn"):
+            state.pop(transient, None)
+        return state
+
+    def __setstate__(self, state):
+        # Snapshots written before the sequence number existed, or with the removed corpus_terms
+        state.pop("corpus_terms", None)
+        state.setdefault("sequence", 0)
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+    def _stored_sequence(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'sequence'").fetchone()
+        return row[0] if row is not None else 0
+
+    def _rebuild(self) -> None:
+        """Recompute the sketch and summaries from the documents table."""
+        self.documents = 0
+        self.document_frequency = CountMinSketch()
+        self.user_terms = {}
+        for user_id, term_counts in self._conn.execute("SELECT user_id, term_counts FROM documents"):
+            self._apply(user_id, json.loads(term_counts), 1)
+        self.sequence = self._stored_sequence()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_STATS_PATH) -> "TermStatistics":
+        if os.path.exists(path):
+            stats = joblib.load(path)
+            stats.path = path
+            stats._open_documents()
+            if stats.sequence != stats._stored_sequence():
+                # The process stopped between snapshots; the documents table is authoritative
+                stats._rebuild()
+            return stats
+        stats = cls(path)
+        if stats._stored_sequence():
+            stats._rebuild()
+        return stats
+
+    def save(self) -> None:
+        """Write a snapshot atomically; recording continues while it is pickled."""
+        if not self.path:
+            return
+        with self._lock:
+            snapshot = TermStatistics.__new__(TermStatistics)
+            snapshot.__dict__.update(copy.deepcopy(self.__getstate__()))
+            self._pending = 0
+        with self._save_lock:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    joblib.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+    def _apply(self, user_id: str, term_counts: Dict[str, int], sign: int) -> None:
+        self.documents += sign
+        summary = self.user_terms.setdefault(user_id, SpaceSaving(USER_TERM_CAPACITY))
+        for term, count in term_counts.items():
+            self.document_frequency.add(term, sign)
+            if sign > 0:
+                summary.add(term, count)
+            else:
+                summary.remove(term, count)
+
+    def _write_sequence(self) -> None:
+        # Called inside the transaction that changes the documents table
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('sequence', ?)", (self.sequence + 1,)
+        )
+
+    def _previous(self, user_id: str, entry_id: str) -> Optional[Dict[str, int]]:
+        row = self._conn.execute(
+            "SELECT term_counts FROM documents WHERE user_id = ? AND entry_id = ?",
+            (user_id, entry_id)
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def record_document(self, user_id: str, entry_id: str, terms: Iterable[str]) -> None:
+        """Add (or replace) one analyzed entry's terms in the corpus and user statistics."""
+        term_counts = dict(Counter(terms))
+        with self._lock:
+            previous = self._previous(user_id, entry_id)
+            if previous == term_counts:
+                return
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (user_id, entry_id, term_counts) VALUES (?, ?, ?)",
+                    (user_id, entry_id, json.dumps(term_counts))
+                )
+                self._write_sequence()
+            if previous is not None:
+                self._apply(user_id, previous, -1)
+            self._apply(user_id, term_counts, 1)
+            self.sequence += 1
+            self._pending += 1
+            should_save = self._pending >= SAVE_EVERY
+        if should_save:
+            self.save()
+
+    def remove_document(self, user_id: str, entry_id: str) -> bool:
+        """Take a deleted entry's terms back out of the statistics."""
+        with self._lock:
+            previous = self._previous(user_id, entry_id)
+            if previous is None:
+                return False
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM documents WHERE user_id = ? AND entry_id = ?", (user_id, entry_id)
+                )
+                self._write_sequence()
+            self._apply(user_id, previous, -1)
+            self.sequence += 1
+            self._pending += 1
+            should_save = self._pending >= SAVE_EVERY
+        if should_save:
+            self.save()
+        return True
+
+    def idf(self, term: str) -> float:
+        """Smoothed inverse document frequency, as in scikit-learn's TfidfTransformer."""
+        df = self.document_frequency.estimate(term)
+        return math.log((1 + max(self.documents, 0)) / (1 + df)) + 1
+
+    def key_phrases(self, terms: List[str], k: int = 5) -> List[str]:
+        """Top-k distinct terms of one document by TF-IDF; ties keep document order."""
+        term_counts = Counter(terms)
+        order = {term: i for i, term in reversed(list(enumerate(terms)))}
+        scored = sorted(term_counts, key=lambda t: (-term_counts[t] * self.idf(t), order[t]))
+        return scored[:k]
+
+    def top_terms(self, user_id: str, n: int = 50) -> List[Dict[str, Any]]:
+        """The user's heaviest terms weighted by TF-IDF, in the word cloud's {text, value} shape."""
+        summary = self.user_terms.get(user_id)
+        if summary is None:
+            return []
+        with self._lock:
+            weighted = [(term, count * self.idf(term)) for term, count in summary.counts.items()]
+        weighted.sort(key=lambda x: (-x[1], x[0]))
+        return [{"text": term, "value": round(weight, 4)} for term, weight in weighted[:n]]
+
+
+_term_statistics: Optional[TermStatistics] = None
+_term_statistics_lock = threading.Lock()
+
+
+def get_term_statistics() -> TermStatistics:
+    """Process-wide term statistics, loaded from disk on first use."""
+    global _term_statistics
+    with _term_statistics_lock:
+        if _term_statistics is None:
+            _term_statistics = TermStatistics.load()
+        return _term_statistics
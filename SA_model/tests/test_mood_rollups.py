@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mood_rollups import MoodRollupStore
+
+FULL = {"sentiment_score": 0.8, "sentiment_label": "Positive", "degraded": False}
+DEGRADED = {"sentiment_score": 0.1, "sentiment_label": "Neutral", "degraded": True}
+
+
+def mean_score(store):
+    return store.timeseries("u", "day")[0]["mean_sentiment_score"]
+
+
+def test_degraded_result_never_replaces_full_one(tmp_path):
+    store = MoodRollupStore(str(tmp_path / "rollups.sqlite3"))
+    # The background upgrade lands before the request stores its degraded result
+    store.record_entry("u", "e", FULL, "2026-10-01", "key")
+    assert not store.record_entry("u", "e", DEGRADED, "2026-10-01", "key")
+    assert mean_score(store) == 0.8
+
+
+def test_full_result_replaces_degraded_one(tmp_path):
+    store = MoodRollupStore(str(tmp_path / "rollups.sqlite3"))
+    store.record_entry("u", "e", DEGRADED, "2026-10-01", "key")
+    store.record_entry("u", "e", FULL, "2026-10-01", "key")
+    assert mean_score(store) == 0.8
+
+
+def test_degraded_result_of_edited_entry_replaces_full_one(tmp_path):
+    store = MoodRollupStore(str(tmp_path / "rollups.sqlite3"))
+    store.record_entry("u", "e", FULL, "2026-10-01", "old")
+    assert store.record_entry("u", "e", DEGRADED, "2026-10-01", "new")
+    assert mean_score(store) == 0.1
@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import overload
+from overload import OverloadController
+
+
+def cheap(text, image=None):
+    return {"sentiment_score": 0.1, "sentiment_label": "Positive"}
+
+
+def make_heavy(durations):
+    """A heavy analyzer taking durations[i] seconds on its i-th call, then the last one."""
+    calls = []
+
+    def heavy(text, image=None):
+        calls.append(text)
+        time.sleep(durations[min(len(calls), len(durations)) - 1])
+        return {"confidence": 0.9}
+
+    return heavy
+
+
+def wait_for_upgrades(controller, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while controller.snapshot()["pending_upgrades"] and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_recovers_after_cold_start(monkeypatch):
+    # One slow cold call must not keep the controller degraded once upgrades run fast
+    monkeypatch.setattr(overload, "MIN_DEGRADED_SECONDS", 0.0)
+    controller = OverloadController(make_heavy([0.5, 0.01]), cheap, slo_ms=200, workers=2)
+    try:
+        assert not controller.analyze("k0", "cold")["degraded"]
+        degraded = 0
+        for i in range(1, 40):
+            result = controller.analyze(f"k{i}", f"text {i}")
+            degraded += result["degraded"]
+            wait_for_upgrades(controller)
+        assert degraded > 0
+        assert not controller.degraded
+        assert controller.projected_latency() < 0.2 * overload.RECOVER_RATIO
+        assert not controller.analyze("k-last", "last")["degraded"]
+    finally:
+        controller.shutdown()
+
+
+def test_stale_samples_expire(monkeypatch):
+    controller = OverloadController(make_heavy([0.3]), cheap, slo_ms=200, workers=1)
+    try:
+        controller.analyze("k0", "slow")
+        assert controller.projected_latency() >= 0.3
+        monkeypatch.setattr(overload, "SAMPLE_MAX_AGE", 0.0)
+        assert controller.projected_latency() == 0.0
+    finally:
+        controller.shutdown()
+
+
+def test_failed_upgrade_is_logged(monkeypatch, caplog):
+    def heavy(text, image=None):
+        if text == "boom":
+            raise RuntimeError("heavy failure")
+        time.sleep(0.3)
+        return {}
+
+    controller = OverloadController(heavy, cheap, slo_ms=100, workers=1)
+    try:
+        controller.analyze("k0", "slow")
+        assert controller.analyze("k1", "boom")["degraded"]
+        wait_for_upgrades(controller)
+        assert controller.metrics["upgrades_failed"] == 1
+        assert "Background upgrade of k1 failed" in caplog.text
+    finally:
+        controller.shutdown()
@@ -0,0 +1,401 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+DEFAULT_STORE_DIR = os.environ.get(
+    "VECTOR_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "vector_store")
+)
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+INITIAL_CAPACITY = 1024
+TRAIN_THRESHOLD = 2048  # Below this many vectors search is exact
+RETRAIN_FACTOR = 4  # Retrain the coarse quantizer when the store grows this much
+DEFAULT_NPROBE = 8
+USER_EXACT_LIMIT = 50000  # Users with up to this many entries are searched exhaustively
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 20000
+COMPACT_MIN_DELETED = 1024  # Compact once tombstones reach this many and outnumber live rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    row INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    entry_id TEXT NOT NULL,
+    cell INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    text_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS rows_entry ON rows (user_id, entry_id, deleted);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _kmeans(vectors: np.ndarray, n_clusters: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (cosine) returning unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for cell in range(n_clusters):
+            members = vectors[assignment == cell]
+            if len(members):
+                centroids[cell] = members.sum(axis=0)
+            else:
+                # Re-seed empty cells so every list stays useful
+                centroids[cell] = vectors[rng.integers(len(vectors))]
+        centroids = _normalize(centroids)
+    return centroids.astype(np.float32)
+
+
+class VectorStore:
+    """
+    Append-only store of entry embeddings with an IVF index for similar-entry search.
+    Vectors are kept unit-normalized as float16 in a memory-mapped file, so the OS pages
+    them in on demand; row metadata lives in SQLite. Updating an entry appends a new row
+    and tombstones the old one; once tombstones outnumber live rows the live ones are
+    copied into a fresh vectors file and renumbered. Once enough vectors exist they are partitioned by a
+    k-means coarse quantizer and a query only scans the `nprobe` closest cells.
+    Searches within one user scan that user's own rows instead: exhaustively up to
+    USER_EXACT_LIMIT rows, beyond that through cells probed in proportion to the user's
+    share of the store. The quantizer is (re)trained on a background thread and swapped
+    in when done, so inserts never wait for k-means.
+    """
+
+    def __init__(self, directory: str = DEFAULT_STORE_DIR, dim: int = EMBEDDING_DIM):
+        self.directory = directory
+        self.dim = dim
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._centroids_path = os.path.join(directory, "centroids.npy")
+        self._conn = sqlite3.connect(os.path.join(directory, "rows.sqlite3"), check_same_thread=False)
+        # Every insert commits; WAL keeps that from costing a full fsync per entry
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if "text_hash" not in [column[1] for column in self._conn.execute("PRAGMA table_info(rows)")]:
+            # Stores created before text hashes were recorded
+            self._conn.execute("ALTER TABLE rows ADD COLUMN text_hash TEXT")
+        self._conn.commit()
+        # Compaction writes a new vectors file and switches to it in the same transaction
+        # that renumbers the rows, so the two never disagree
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'vectors_file'").fetchone()
+        self._vectors_path = os.path.join(directory, row[0] if row is not None else "vectors.f16")
+        self._vectors = None
+        self._training: Optional[threading.Thread] = None
+        self._load()
+
+    def _reset(self) -> None:
+        self._user_codes: Dict[str, int] = {}
+        self._entry_ids: List[str] = []
+        self._row_users = np.zeros(0, dtype=np.int32)
+        self._row_cells = np.zeros(0, dtype=np.int32)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._user_rows: Dict[int, set] = {}
+        self._count = 0
+        self._open_vectors(max(INITIAL_CAPACITY, self._stored_rows()))
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_at = 0
+        self._lists: List[List[int]] = []
+
+    def _stored_rows(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM rows").fetchone()[0]
+
+    def _open_vectors(self, capacity: int) -> None:
+        size = capacity * self.dim * 2
+        if not os.path.exists(self._vectors_path) or os.path.getsize(self._vectors_path) < size:
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(size)
+        capacity = os.path.getsize(self._vectors_path) // (self.dim * 2)
+        if self._vectors is not None:
+            self._vectors.flush()
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+        self._row_users = np.resize(self._row_users, capacity)
+        self._row_cells = np.resize(self._row_cells, capacity)
+        self._deleted = np.resize(self._deleted, capacity)
+        self._deleted[len(self._entry_ids):] = True
+
+    def _user_code(self, user_id: str) -> int:
+        if user_id not in self._user_codes:
+            self._user_codes[user_id] = len(self._user_codes)
+        return self._user_codes[user_id]
+
+    def _load(self) -> None:
+        self._reset()
+        if os.path.exists(self._centroids_path):
+            self._centroids = np.load(self._centroids_path)
+            self._lists = [[] for _ in range(len(self._centroids))]
+        for row, user_id, entry_id, cell, deleted in self._conn.execute(
+                "SELECT row, user_id, entry_id, cell, deleted FROM rows ORDER BY row"):
+            self._entry_ids.append(entry_id)
+            code = self._user_code(user_id)
+            self._row_users[row] = code
+            self._row_cells[row] = cell
+            self._deleted[row] = bool(deleted)
+            if not deleted:
+                self._user_rows.setdefault(code, set()).add(row)
+                if self._centroids is not None and cell >= 0:
+                    self._lists[cell].append(row)
+        self._count = len(self._entry_ids)
+        self._trained_at = self._count if self._centroids is not None else 0
+
+    @property
+    def live_count(self) -> int:
+        return int(self._count - self._deleted[:self._count].sum())
+
+    def has_text(self, user_id: str, entry_id: str, text_hash: str) -> bool:
+        """Whether the entry's live embedding was computed from a text with this hash."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM rows WHERE user_id = ? AND entry_id = ? AND deleted = 0 AND text_hash = ?",
+                (user_id, entry_id, text_hash)
+            ).fetchone()
+        return row is not None
+
+    def add(self, user_id: str, entry_id: str, vector: np.ndarray, text_hash: Optional[str] = None) -> int:
+        """Store the embedding of an entry, replacing any previous one. Returns the new row."""
+        vector = _normalize(np.asarray(vector, dtype=np.float32).reshape(self.dim))
+        with self._lock:
+            row = self._add_locked(user_id, entry_id, vector, text_hash)
+            if self._needs_compaction():
+                self._compact_locked()
+                row = self._conn.execute(
+                    "SELECT row FROM rows WHERE user_id = ? AND entry_id = ? AND deleted = 0", (user_id, entry_id)
+                ).fetchone()[0]
+            elif self._needs_training() and self._training is None:
+                self._training = threading.Thread(target=self._train, name="vector-store-train", daemon=True)
+                self._training.start()
+        return row
+
+    def _add_locked(self, user_id: str, entry_id: str, vector: np.ndarray, text_hash: Optional[str]) -> int:
+        with self._conn:
+            self._delete_locked(user_id, entry_id)
+            row = self._count
+            if row >= len(self._vectors):
+                self._open_vectors(len(self._vectors) * 2)
+            self._vectors[row] = vector
+            cell = -1
+            if self._centroids is not None:
+                cell = int(np.argmax(self._centroids @ vector))
+                self._lists[cell].append(row)
+            self._conn.execute(
+                "INSERT INTO rows (row, user_id, entry_id, cell, text_hash) VALUES (?, ?, ?, ?, ?)",
+                (row, user_id, entry_id, cell, text_hash)
+            )
+            self._entry_ids.append(entry_id)
+            code = self._user_code(user_id)
+            self._row_users[row] = code
+            self._row_cells[row] = cell
+            self._deleted[row] = False
+            self._user_rows.setdefault(code, set()).add(row)
+            self._count += 1
+        return row
+
+    def delete(self, user_id: str, entry_id: str) -> bool:
+        with self._lock:
+            with self._conn:
+                deleted = self._delete_locked(user_id, entry_id)
+            if self._needs_compaction():
+                self._compact_locked()
+        return deleted
+
+    def _delete_locked(self, user_id: str, entry_id: str) -> bool:
+        rows = self._conn.execute(
+            "SELECT row, cell FROM rows WHERE user_id = ? AND entry_id = ? AND deleted = 0",
+            (user_id, entry_id)
+        ).fetchall()
+        for row, cell in rows:
+            self._deleted[row] = True
+            self._user_rows[int(self._row_users[row])].discard(row)
+            if self._centroids is not None and cell >= 0:
+                self._lists[cell].remove(row)
+        if rows:
+            self._conn.execute(
+                "UPDATE rows SET deleted = 1 WHERE user_id = ? AND entry_id = ?", (user_id, entry_id)
+            )
+        return bool(rows)
+
+    def _needs_compaction(self) -> bool:
+        # A running training holds row numbers from its snapshot, so wait for it to finish
+        tombstones = self._count - self.live_count
+        return self._training is None and tombstones >= max(COMPACT_MIN_DELETED, self.live_count)
+
+    def compact(self) -> int:
+        """Drop tombstoned rows now. Returns the number of rows removed."""
+        self.wait_for_training()
+        with self._lock:
+            return self._compact_locked()
+
+    def _compact_locked(self) -> int:
+        """
+        Copy the live vectors into a new file and renumber their rows in order. The file
+        switch is recorded in the same transaction as the renumbering; rows keep their cells.
+        """
+        live = np.flatnonzero(~self._deleted[:self._count])
+        removed = self._count - len(live)
+        if removed == 0 or self._training is not None:
+            return 0
+        old_path = self._vectors_path
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        generation = int(row[0]) + 1 if row is not None else 1
+        new_name = f"vectors-{generation}.f16"
+        new_path = os.path.join(self.directory, new_name)
+        capacity = max(INITIAL_CAPACITY, len(live))
+        with open(new_path, "wb") as f:
+            f.truncate(capacity * self.dim * 2)
+        vectors = np.memmap(new_path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+        for start in range(0, len(live), 8192):
+            rows = live[start:start + 8192]
+            vectors[start:start + len(rows)] = self._vectors[rows]
+        vectors.flush()
+        del vectors
+
+        with self._conn:
+            self._conn.execute("DELETE FROM rows WHERE deleted = 1")
+            # New row numbers never exceed old ones, so renumbering in order never collides
+            self._conn.executemany("UPDATE rows SET row = ? WHERE row = ?",
+                                   [(new, int(old)) for new, old in enumerate(live.tolist())])
+            self._conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                   [("vectors_file", new_name), ("generation", str(generation))])
+        self._vectors = None
+        self._vectors_path = new_path
+        trained_at = self._trained_at
+        self._load()
+        if self._centroids is not None:
+            self._trained_at = min(trained_at, self._count)
+        os.remove(old_path)
+        return removed
+
+    def _needs_training(self) -> bool:
+        if self._centroids is None:
+            return self.live_count >= TRAIN_THRESHOLD
+        return self._count >= self._trained_at * RETRAIN_FACTOR
+
+    def _train(self) -> None:
+        """
+        Fit the coarse quantizer on a snapshot of the live vectors without holding the
+        lock, then swap it in, assigning rows added in the meantime to the new cells.
+        """
+        try:
+            with self._lock:
+                count = self._count
+                live = np.flatnonzero(~self._deleted[:count])
+                vectors = self._vectors
+            n_cells = int(min(4096, max(16, np.sqrt(len(live)))))
+            rng = np.random.default_rng(0)
+            sample = live if len(live) <= KMEANS_SAMPLE else rng.choice(live, KMEANS_SAMPLE, replace=False)
+            # Rows below the snapshot count are never rewritten, so reading them unlocked is safe
+            centroids = _kmeans(np.asarray(vectors[np.sort(sample)], dtype=np.float32), n_cells)
+            cells = np.full(count, -1, dtype=np.int32)
+            for start in range(0, len(live), 8192):
+                rows = live[start:start + 8192]
+                cells[rows] = np.argmax(np.asarray(vectors[rows], dtype=np.float32) @ centroids.T, axis=1)
+
+            with self._lock, self._conn:
+                cells = np.resize(cells, self._count)
+                added = np.arange(count, self._count)
+                if len(added):
+                    cells[added] = np.argmax(np.asarray(self._vectors[added], dtype=np.float32) @ centroids.T, axis=1)
+                live = np.flatnonzero(~self._deleted[:self._count])
+                lists: List[List[int]] = [[] for _ in range(n_cells)]
+                for row, cell in zip(live.tolist(), cells[live].tolist()):
+                    lists[cell].append(row)
+                self._conn.executemany("UPDATE rows SET cell = ? WHERE row = ?",
+                                       [(int(cells[row]), int(row)) for row in live])
+                np.save(self._centroids_path, centroids)
+                self._vectors.flush()
+                self._row_cells[live] = cells[live]
+                self._centroids = centroids
+                self._lists = lists
+                self._trained_at = self._count
+        finally:
+            with self._lock:
+                self._training = None
+
+    def wait_for_training(self) -> None:
+        """Block until a running quantizer (re)training has been swapped in."""
+        training = self._training
+        if training is not None:
+            training.join()
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        if self._centroids is None:
+            return np.arange(self._count)
+        probes = np.argsort(-(self._centroids @ query))[:nprobe]
+        rows = [row for cell in probes for row in self._lists[cell]]
+        return np.array(rows, dtype=np.int64)
+
+    def _user_candidates(self, query: np.ndarray, user_id: str, nprobe: int) -> np.ndarray:
+        code = self._user_codes.get(user_id)
+        rows = self._user_rows.get(code) if code is not None else None
+        if not rows:
+            return np.zeros(0, dtype=np.int64)
+        rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        if self._centroids is None or len(rows) <= USER_EXACT_LIMIT:
+            return rows
+        # Probe more cells the smaller the user's share of the store, so the number of
+        # the user's own rows scanned matches what an unscoped search would see
+        share = len(rows) / max(self.live_count, 1)
+        nprobe = min(len(self._centroids), int(np.ceil(nprobe / share)))
+        probes = np.argsort(-(self._centroids @ query))[:nprobe]
+        return rows[np.isin(self._row_cells[rows], probes)]
+
+    def _search(self, query: np.ndarray, rows: np.ndarray, k: int,
+                exclude_entry: Optional[str]) -> List[Dict[str, Any]]:
+        rows = rows[~self._deleted[rows]]
+        if exclude_entry is not None:
+            rows = rows[[self._entry_ids[row] != exclude_entry for row in rows.tolist()]] if len(rows) else rows
+        if len(rows) == 0:
+            return []
+        rows = np.sort(rows)  # Sequential reads from the memory map
+        scores = np.asarray(self._vectors[rows], dtype=np.float32) @ query
+        top = np.argpartition(-scores, min(k, len(rows)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"entry_id": self._entry_ids[rows[i]], "score": float(scores[i])} for i in top]
+
+    def search(self, query: np.ndarray, k: int = 5, user_id: Optional[str] = None,
+               nprobe: int = DEFAULT_NPROBE, exclude_entry: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Approximate top-k entries by cosine similarity, optionally restricted to one user."""
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(self.dim))
+        with self._lock:
+            if user_id is not None:
+                rows = self._user_candidates(query, user_id, nprobe)
+            else:
+                rows = self._candidates(query, nprobe)
+            return self._search(query, rows, k, exclude_entry)
+
+    def search_exact(self, query: np.ndarray, k: int = 5, user_id: Optional[str] = None,
+                     exclude_entry: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Brute-force top-k, used as ground truth for recall measurements."""
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(self.dim))
+        with self._lock:
+            rows = np.arange(self._count)
+            if user_id is not None:
+                code = self._user_codes.get(user_id)
+                if code is None:
+                    return []
+                rows = rows[self._row_users[:self._count] == code]
+            return self._search(query, rows, k, exclude_entry)
+
+    def get(self, user_id: str, entry_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT row FROM rows WHERE user_id = ? AND entry_id = ? AND deleted = 0", (user_id, entry_id)
+            ).fetchone()
+            if row is None:
+                return None
+            return np.asarray(self._vectors[row[0]], dtype=np.float32)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._vectors.flush()
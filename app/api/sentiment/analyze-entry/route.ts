@@ -1,8 +1,13 @@
 import { NextResponse } from 'next/server';
+import { getSessionUser, getOwnedEntry, sentimentServiceHeaders } from '@/utilities/sentimentService';
 
 export async function POST(request: Request) {
   try {
     console.log('Starting sentiment analysis request...');
+    const user = await getSessionUser();
+    if (!user) {
+      return NextResponse.json({ error: 'Authentication required' }, { status: 401 });
+    }
     const formData = await request.formData();
     const text = formData.get('text') as string;
     const image = formData.get('image') as File | null;
@@ -33,6 +38,20 @@ export async function POST(request: Request) {
     if (image) {
       forwardForm.append('image', image, (image as File).name);
     }
+    // Analyses of a saved journal are recorded in the user's mood rollups, word cloud and
+    // similar-entry index. The user comes from the session and the journal must be theirs.
+    const journalId = formData.get('entry_id');
+    if (typeof journalId === 'string' && journalId && !journalId.startsWith('temp_')) {
+      const entry = await getOwnedEntry(journalId, user.userId);
+      if (!entry) {
+        return NextResponse.json({ error: 'Journal entry not found' }, { status: 404 });
+      }
+      forwardForm.append('user_id', String(user.userId));
+      forwardForm.append('entry_id', entry.entryId);
+      if (entry.entryDate) {
+        forwardForm.append('entry_date', entry.entryDate);
+      }
+    }
 
     // Add timeout using AbortController
     const controller = new AbortController();
@@ -44,6 +63,7 @@ export async function POST(request: Request) {
       response = await fetch(MODEL_URL, {
         method: 'POST',
         body: forwardForm,
+        headers: sentimentServiceHeaders(),
         signal: controller.signal,
       });
     } finally {
@@ -0,0 +1,31 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { getSessionUser, sentimentServiceHeaders, sentimentServiceUrl } from '@/utilities/sentimentService';
+
+// The signed-in user's mood rollups from the model service
+export async function GET(request: NextRequest) {
+  try {
+    const user = await getSessionUser();
+    if (!user) {
+      return NextResponse.json({ error: 'Authentication required' }, { status: 401 });
+    }
+
+    const url = new URL(sentimentServiceUrl('/mood-timeseries'));
+    url.searchParams.set('user_id', String(user.userId));
+    for (const param of ['granularity', 'start', 'end', 'top_k']) {
+      const value = request.nextUrl.searchParams.get(param);
+      if (value) {
+        url.searchParams.set(param, value);
+      }
+    }
+
+    const response = await fetch(url, { headers: sentimentServiceHeaders() });
+    const result = await response.json();
+    return NextResponse.json(result, { status: response.status });
+  } catch (error: unknown) {
+    console.error('Mood timeseries error:', error);
+    return NextResponse.json(
+      { error: 'Failed to load mood timeseries', details: error instanceof Error ? error.message : 'Unknown error' },
+      { status: 500 }
+    );
+  }
+}
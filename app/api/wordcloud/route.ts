@@ -105,23 +105,32 @@ function generateWordCloud(
 
 export async function POST(request: NextRequest) {
   try {
-    const { words } = await request.json();
+    const { words, weightedWords } = await request.json();
 
-    if (!words || !Array.isArray(words) || words.length === 0) {
-      return NextResponse.json({ error: 'No words available to generate word cloud' }, { status: 400 });
-    }
+    let wordData: WordData[];
+    if (Array.isArray(weightedWords) && weightedWords.length > 0) {
+      // Pre-weighted terms from the model service's /word-cloud endpoint
+      wordData = (weightedWords as WordData[]).map(({ text, value }) => ({
+        text,
+        value: Math.max(1, Number(value) * 10) // Scale up the values
+      }));
+    } else {
+      if (!words || !Array.isArray(words) || words.length === 0) {
+        return NextResponse.json({ error: 'No words available to generate word cloud' }, { status: 400 });
+      }
 
-    // Create word frequency data
-    const wordFreq = words.reduce((acc: Record<string, number>, word: string) => {
-      acc[word] = (acc[word] || 0) + 1;
-      return acc;
-    }, {});
+      // Create word frequency data
+      const wordFreq = words.reduce((acc: Record<string, number>, word: string) => {
+        acc[word] = (acc[word] || 0) + 1;
+        return acc;
+      }, {});
 
-    // Convert to array format
-    const wordData: WordData[] = Object.entries(wordFreq).map(([text, value]) => ({
-      text,
-      value: Math.max(1, Number(value) * 10) // Scale up the values
-    }));
+      // Convert to array format
+      wordData = Object.entries(wordFreq).map(([text, value]) => ({
+        text,
+        value: Math.max(1, Number(value) * 10) // Scale up the values
+      }));
+    }
 
     // Create canvas
     const width = 800;
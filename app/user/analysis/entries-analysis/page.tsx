@@ -7,7 +7,7 @@ import { getAllJournalEntries } from "@/utilities/journal-data";
 import { Card, CardContent, CardHeader, CardTitle, CardFooter } from '@/components/ui/quilted-gallery/ui/card';
 import { Badge } from "@/components/ui/badge";
 import { Sparkles, Calendar, Loader2, BarChart2, Book, ArrowRight, History } from "lucide-react";
-import AnalysisCharts from "@/components/Journal/AnalysisCharts";
+import AnalysisCharts, { MoodBucket } from "@/components/Journal/AnalysisCharts";
 import { useTheme } from "@/utilities/context/ThemeContext";
 import { Button } from '@/components/ui/button2';
 import { Skeleton } from "@/components/ui/skeleton";
@@ -86,6 +86,24 @@ const AnalysisPage: React.FC = () => {
   const [error, setError] = useState<string | null>(null);
   const [processingEntries, setProcessingEntries] = useState<Record<string, boolean>>({});
   const [history, setHistory] = useState<AnalysisHistoryEntry[]>([]);
+  const [moodTimeseries, setMoodTimeseries] = useState<MoodBucket[]>([]);
+
+  // Daily mood rollups the model service keeps for every analyzed entry
+  const loadMoodTimeseries = async () => {
+    try {
+      const response = await fetch("/api/sentiment/mood-timeseries?granularity=day");
+      if (response.ok) {
+        const data = await response.json();
+        setMoodTimeseries(data.buckets || []);
+      }
+    } catch (err) {
+      console.error('Failed to load mood timeseries:', err);
+    }
+  };
+
+  useEffect(() => {
+    loadMoodTimeseries();
+  }, []);
 
   // Theme context
   const { currentTheme, isDarkMode } = useTheme();
@@ -162,6 +180,7 @@ const AnalysisPage: React.FC = () => {
       
       const formData = new FormData();
       formData.append("text", entry.content || "");
+      formData.append("entry_id", entry.journalId);
       
       if (entry.mediaUrl?.image?.[0]) {
         const imageResponse = await fetch(entry.mediaUrl.image[0]);
@@ -186,6 +205,7 @@ const AnalysisPage: React.FC = () => {
 
       // Save to history
       saveToHistory(entry, result);
+      loadMoodTimeseries();
 
       return result;
     } catch (error) {
@@ -504,7 +524,7 @@ const AnalysisPage: React.FC = () => {
                       </CardTitle>
                     </CardHeader>
                     <CardContent>
-                      <AnalysisCharts entries={analyzedEntries} />
+                      <AnalysisCharts entries={analyzedEntries} timeseries={moodTimeseries} />
                     </CardContent>
                   </Card>
                 )}
@@ -44,22 +44,38 @@ export interface AnalysisResult {
   key_phrases: string[];
 }
 
+// One bucket of the model service's incremental mood rollups (/mood-timeseries)
+export interface MoodBucket {
+  bucket: string;
+  entry_count: number;
+  mean_sentiment_score: number;
+  label_counts: Record<string, number>;
+  emotion_score_sums: Record<string, number>;
+  key_phrases: string[];
+}
+
 interface AnalysisChartsProps {
   entries: Array<{
     title: string;
     date: string;
     analysis: AnalysisResult;
   }>;
+  timeseries?: MoodBucket[];
 }
 
-const AnalysisCharts: React.FC<AnalysisChartsProps> = ({ entries }) => {
-  // Sentiment trend
+const AnalysisCharts: React.FC<AnalysisChartsProps> = ({ entries, timeseries }) => {
+  // Sentiment trend: the server-side daily rollups when available, else the analyzed entries
+  const useRollups = !!timeseries && timeseries.length > 0;
   const sentimentTrendData = {
-    labels: entries.map(entry => new Date(entry.date).toLocaleDateString()),
+    labels: useRollups
+      ? timeseries!.map(bucket => new Date(bucket.bucket).toLocaleDateString())
+      : entries.map(entry => new Date(entry.date).toLocaleDateString()),
     datasets: [
       {
-        label: 'Sentiment Score',
-        data: entries.map(entry => entry.analysis.sentiment_score),
+        label: useRollups ? 'Daily Mean Sentiment' : 'Sentiment Score',
+        data: useRollups
+          ? timeseries!.map(bucket => bucket.mean_sentiment_score)
+          : entries.map(entry => entry.analysis.sentiment_score),
         borderColor: 'rgb(75, 192, 192)',
         backgroundColor: 'rgba(75, 192, 192, 0.5)',
         tension: 0.4,
@@ -836,6 +836,10 @@ const JournalEntry: React.FC<{
     try {
       const formData = new FormData();
       formData.append("text", content);
+      // Saved entries are recorded in the mood timeline; the server checks ownership
+      if (currentJournalId && !currentJournalId.startsWith('temp_')) {
+        formData.append("entry_id", currentJournalId);
+      }
 
       // Find the first successful image upload
       const imageFile = mediaFiles.find(m => m.type === 'image' && m.status === 'success');
@@ -0,0 +1,44 @@
+// utilities/sentimentService.ts
+import { getServerSession } from 'next-auth/next';
+import { authOptions } from '@/utilities/auth';
+import User from '@/models/User';
+import Journal from '@/models/JournalModel';
+import connectDB from '@/db/connectDB';
+
+// The model service only accepts per-user reads and writes carrying this token,
+// so user ids always come from this backend's session, never from the browser
+export const sentimentServiceHeaders = (): Record<string, string> => {
+  const token = process.env.SENTIMENT_SERVICE_TOKEN;
+  return token ? { 'X-Service-Token': token } : {};
+};
+
+// SENTIMENT_MODEL_URL points at /analyze-entry; other endpoints live next to it
+export const sentimentServiceUrl = (path: string): string => {
+  const modelUrl = process.env.SENTIMENT_MODEL_URL;
+  if (!modelUrl) {
+    throw new Error('SENTIMENT_MODEL_URL is not defined in environment variables');
+  }
+  return new URL(path, modelUrl).toString();
+};
+
+export const getSessionUser = async () => {
+  const session = await getServerSession(authOptions);
+  if (!session?.user?.email) {
+    return null;
+  }
+  await connectDB();
+  return User.findOne({ email: session.user.email });
+};
+
+// The journal's id and ISO date, if it exists and belongs to the user
+export const getOwnedEntry = async (journalId: string, userId: number) => {
+  const journal = await Journal.findOne({ journalId });
+  if (!journal || journal.userId !== userId) {
+    return null;
+  }
+  const date = new Date(journal.date || journal.timestamp);
+  return {
+    entryId: journal.journalId,
+    entryDate: isNaN(date.getTime()) ? undefined : date.toISOString()
+  };
+};